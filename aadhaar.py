@@ -0,0 +1,187 @@
+import re
+
+
+# Devanagari, Malayalam and Telugu digit blocks all map onto 0-9 in order.
+NATIVE_DIGITS = str.maketrans({chr(base + i): str(i) for base in (0x0966, 0x0D66, 0x0C66) for i in range(10)})
+
+# Spoken digit words as the recognizer writes them for en-IN / hi-IN / ml-IN / te-IN.
+# Numbers are read out digit by digit, so only 0-9 are needed.
+NUMBER_WORDS = {
+    # English
+    'zero': '0', 'oh': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
+    'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
+    # Hindi
+    'शून्य': '0', 'जीरो': '0', 'ज़ीरो': '0', 'एक': '1', 'दो': '2', 'तीन': '3', 'चार': '4',
+    'पांच': '5', 'पाँच': '5', 'छह': '6', 'छः': '6', 'छे': '6', 'सात': '7', 'आठ': '8', 'नौ': '9',
+    # Malayalam
+    'പൂജ്യം': '0', 'ഒന്ന്': '1', 'രണ്ട്': '2', 'മൂന്ന്': '3', 'നാല്': '4', 'അഞ്ച്': '5',
+    'ആറ്': '6', 'ഏഴ്': '7', 'എട്ട്': '8', 'ഒമ്പത്': '9', 'ഒൻപത്': '9',
+    # Telugu
+    'సున్నా': '0', 'సున్న': '0', 'ఒకటి': '1', 'రెండు': '2', 'మూడు': '3', 'నాలుగు': '4',
+    'ఐదు': '5', 'అయిదు': '5', 'ఆరు': '6', 'ఏడు': '7', 'ఎనిమిది': '8', 'తొమ్మిది': '9',
+}
+
+REPEATERS = {
+    'double': 2, 'triple': 3,
+    'डबल': 2, 'ट्रिपल': 3,
+    'ഡബിൾ': 2, 'ട്രിപ്പിൾ': 3,
+    'డబుల్': 2, 'ట్రిపుల్': 3,
+}
+
+AADHAAR_WORDS = ('aadhaar', 'aadhar', 'adhaar', 'adhar', 'आधार', 'ആധാർ', 'ആധാര്', 'ఆധార్')
+# "My ID is 4567": a short number only counts as a record id when it is named as one.
+ID_WORDS = re.compile(r'\bid\b|आईडी|ഐഡി|ఐడి')
+# Filler words allowed around a bare number reply ("it is 4567", "yes, 4567").
+BARE_NUMBER_WORDS = 2
+
+_SEPARATORS = re.compile(r'[\s\-–,]+')
+_STRIP = '.!?।॥:;"\'()[]'
+
+# Verhoeff tables (dihedral group D5), used by UIDAI for the Aadhaar check digit.
+_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 7, 6, 8, 0],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+_INV = [0, 4, 3, 2, 1, 5, 6, 7, 8, 9]
+
+
+def verhoeff_valid(number: str) -> bool:
+    c = 0
+    for i, digit in enumerate(reversed(number)):
+        c = _D[c][_P[i % 8][int(digit)]]
+    return c == 0
+
+
+def verhoeff_check_digit(number: str) -> str:
+    c = 0
+    for i, digit in enumerate(reversed(number)):
+        c = _D[c][_P[(i + 1) % 8][int(digit)]]
+    return str(_INV[c])
+
+
+def is_valid_aadhaar(number: str) -> bool:
+    return len(number) == 12 and number.isdigit() and number[0] not in '01' and verhoeff_valid(number)
+
+
+def digit_runs(text: str) -> list:
+    """
+    Returns the digit sequences spoken in text. Native-script numerals and digit
+    words are normalized, "double five" expands to "55", and groups separated by
+    spaces or hyphens ("4264 5678 9012") are joined into one run.
+    """
+    runs = []
+    current = ""
+    repeat = 1
+    for raw in _SEPARATORS.split(text.translate(NATIVE_DIGITS)):
+        token = raw.strip(_STRIP).lower()
+        if not token:
+            continue
+        if token in REPEATERS:
+            repeat = REPEATERS[token]
+            continue
+        if token.isdigit():
+            digits = token[0] * (repeat - 1) + token if len(token) == 1 else token
+        elif token in NUMBER_WORDS:
+            digits = NUMBER_WORDS[token] * repeat
+        else:
+            digits = None
+        repeat = 1
+        if digits is None:
+            if current:
+                runs.append(current)
+            current = ""
+            continue
+        current += digits
+        if raw.rstrip()[-1:] in '.!?।॥' and current:
+            runs.append(current)
+            current = ""
+    if current:
+        runs.append(current)
+    return runs
+
+
+def find_user_id(text: str, is_known=None):
+    """
+    Returns (user_id, status). status is 'valid' for a checksum-valid Aadhaar,
+    'short' for a 3-11 digit record id, 'invalid' for a 12-digit number that
+    fails the Verhoeff check, 'partial' when only stray digits were heard and
+    'none' when the message has no number at all.
+
+    A 3-11 digit run is only taken as an id when the message names it as one,
+    is little more than the number itself, or is_known(run) finds the record;
+    otherwise it is an amount or a date ("I received 2000 rupees") and the
+    message counts as having no number. A run on record wins; after that, the
+    one closest after the Aadhaar/ID cue ("I got 2000 rupees, my aadhaar is
+    426456"), or, with nothing after it, the one closest before it.
+    """
+    runs = digit_runs(text)
+    for run in runs:
+        if is_valid_aadhaar(run):
+            return run, 'valid'
+    for run in runs:
+        if len(run) == 12:
+            return 'unknown', 'invalid'
+    short = [run for run in runs if 3 <= len(run) < 12]
+    if short:
+        if is_known is not None:
+            for run in short:
+                if is_known(run):
+                    return run, 'short'
+        cue = id_cue_span(text)
+        if cue is not None:
+            lowered = text.lower()
+            after = [run for run in digit_runs(lowered[cue[1]:]) if 3 <= len(run) < 12]
+            if after:
+                return after[0], 'short'
+            before = [run for run in digit_runs(lowered[:cue[0]]) if 3 <= len(run) < 12]
+            if before:
+                return before[-1], 'short'
+        if is_bare_number(text):
+            return short[0], 'short'
+        return 'unknown', 'none'
+    if runs:
+        return 'unknown', 'partial'
+    return 'unknown', 'none'
+
+
+def id_cue_span(text: str):
+    """(start, end) of the first Aadhaar or ID word in text, or None."""
+    lowered = text.lower()
+    spans = [(i, i + len(word)) for word in AADHAAR_WORDS for i in [lowered.find(word)] if i >= 0]
+    match = ID_WORDS.search(lowered)
+    if match:
+        spans.append(match.span())
+    return min(spans) if spans else None
+
+
+def mentions_aadhaar(text: str) -> bool:
+    lowered = text.lower()
+    return any(word in lowered for word in AADHAAR_WORDS)
+
+
+def is_bare_number(text: str) -> bool:
+    """True when text is a number with at most a couple of filler words around it."""
+    words = 0
+    for raw in _SEPARATORS.split(text.translate(NATIVE_DIGITS)):
+        token = raw.strip(_STRIP).lower()
+        if token and not token.isdigit() and token not in NUMBER_WORDS and token not in REPEATERS:
+            words += 1
+    return words <= BARE_NUMBER_WORDS
@@ -0,0 +1,86 @@
+import threading
+import time
+import numpy as np
+import speech_recognition
+
+
+class CaptureBuffer:
+    """
+    Growable int16 buffer for microphone capture. Blocks are converted and copied
+    into preallocated storage as they arrive; capacity doubles when exhausted, so
+    a turn costs a handful of allocations instead of a list of 50 ms arrays.
+    """
+
+    def __init__(self, sample_rate, initial_seconds=10, channels=1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.data = np.empty((int(sample_rate * initial_seconds), channels), dtype=np.int16)
+        self.length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.length
+
+    def duration(self):
+        return self.length / self.sample_rate
+
+    def _reserve(self, frames):
+        needed = self.length + frames
+        if needed <= len(self.data):
+            return
+        capacity = len(self.data)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.empty((capacity, self.channels), dtype=np.int16)
+        grown[:self.length] = self.data[:self.length]
+        self.data = grown
+
+    def append(self, block):
+        block = np.asarray(block).reshape(-1, self.channels)
+        with self.lock:
+            self._reserve(len(block))
+            target = self.data[self.length:self.length + len(block)]
+            if block.dtype == np.int16:
+                target[:] = block
+            else:
+                # float32 in [-1, 1] from sounddevice
+                np.multiply(np.clip(block, -1.0, 1.0), 32767, out=target, casting='unsafe')
+            self.length += len(block)
+
+    def take(self):
+        """Returns a copy of the captured samples and resets the buffer for the next turn."""
+        with self.lock:
+            samples = self.data[:self.length].copy()
+            self.length = 0
+        return samples
+
+    def clear(self):
+        with self.lock:
+            self.length = 0
+
+
+class FlacAudioData(speech_recognition.AudioData):
+    """
+    AudioData that remembers the FLAC payload the recognizer encoded for upload,
+    so the turn can log bytes sent and separate encode time from request time.
+    """
+
+    def __init__(self, frame_data, sample_rate, sample_width):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self.flac_bytes = None
+        self.encode_seconds = 0.0
+        self._flac_cache = {}
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        key = (convert_rate, convert_width)
+        if key not in self._flac_cache:
+            start = time.perf_counter()
+            self._flac_cache[key] = super().get_flac_data(convert_rate, convert_width)
+            self.encode_seconds += time.perf_counter() - start
+        data = self._flac_cache[key]
+        self.flac_bytes = len(data)
+        return data
+
+
+def to_audio_data(samples, sample_rate):
+    return FlacAudioData(np.ascontiguousarray(samples, dtype=np.int16).tobytes(), sample_rate, 2)
@@ -1,29 +1,60 @@
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
 from langchain.output_parsers import PydanticOutputParser
 from langchain_core.runnables import RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import HumanMessage, AIMessage
 from operator import itemgetter
 from langchain.schema.runnable.passthrough import RunnableAssign
 from pydantic import BaseModel, Field
 from typing import Dict, Union, Optional
 from dotenv import load_dotenv
+from aadhaar import digit_runs, find_user_id, is_valid_aadhaar, mentions_aadhaar
+from intents import classify_intent
+import records
+import retrieval
+import lexical
+import response_cache
+import sessions
+from memory import ConversationMemory
+import asyncio
+import concurrent.futures
+import threading
+import time
 import os
-import re
 
 load_dotenv()
 os.environ.get("NVIDIA_API_KEY")
 
 def extract_aadhaar(text):
+    return find_user_id(text, has_record)[0]
 
-    match = re.search(r'\b(\d{3,12})\b', text)
-    if match:
-        return match.group(1)
-    return 'unknown'
-
+# One client serves the parser, the answer chain and summaries; it holds no
+# per-call state, and each extra ChatNVIDIA costs start-up time.
 instruct_chat = ChatNVIDIA(model="mistralai/mixtral-8x22b-instruct-v0.1")
-instruct_llm = ChatNVIDIA(model="mistralai/mixtral-8x22b-instruct-v0.1") | StrOutputParser()
-chat_llm = ChatNVIDIA(model="mistralai/mixtral-8x22b-instruct-v0.1") | StrOutputParser()
+instruct_llm = instruct_chat | StrOutputParser()
+chat_llm = instruct_chat | StrOutputParser()
+_embedder = None
+
+
+def get_embedder():
+    """Only hybrid retrieval embeds queries, so the client is built on first use."""
+    global _embedder
+    if _embedder is None:
+        _embedder = NVIDIAEmbeddings(model="nvidia/nv-embed-v1")
+    return _embedder
+
+# 'lexical' answers from the local BM25 index only (offline, sub-millisecond);
+# 'hybrid' also asks the embedding endpoint and fuses the two rankings.
+RETRIEVAL_MODE = os.environ.get("PRAGATI_RETRIEVAL", "lexical")
+VECTOR_TIMEOUT = 1.5
+# Per-stage budgets for achat_gen, in seconds.
+RECORD_TIMEOUT = 1.0
+KNOWBASE_TIMEOUT = 10.0
+FIRST_TOKEN_TIMEOUT = 6.0
+TOKEN_TIMEOUT = 3.0
+TURN_TIMEOUT = 30.0
+vector_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
 
 
 # language = "malayalam"
@@ -37,28 +68,53 @@ class KnowledgeBase(BaseModel):
     current_goals: str = Field("", description="What is the current goal of the interaction")
 
 
-def get_scheme_info(user_data: dict, language_for_agent) -> str:
-    """
-    Simulates DB lookup for user scheme info, matching both user_id (Aadhaar) and full name.
-    """
-    db = {
-        "426456": {"name": "Sita", "scheme": "NREGA", "last_credit": "₹2500 on 15-Aug"},
-        "13456": {"name": "Ramesh", "scheme": "PM-Kisan", "last_credit": "₹2000 on 23-Aug"},
-    }
+no_record_messages = {
+    "english": "No record found matching the provided Aadhaar.",
+    "hindi": "प्रदान किए गए आधार और पूरा नाम के लिए कोई रिकॉर्ड नहीं मिला।",
+    "malayalam": "നൽകിയ ആദായവും മുഴുവൻ പേരും പൊരുത്തപ്പെടുന്ന രേഖയൊന്നും കണ്ടെത്തിയില്ല.",
+    "telugu": "నివ్వబడిన ఆధార్ మరియు పూర్తి పేరుతో సరిపోయే రికార్డు కనుగొనబడలేదు."
+}
 
-    user_id = user_data['user_id']
-    # full_name = user_data.get('full_name', "").strip().lower()
+ask_aadhaar_messages = {
+    "english": "Please tell me your Aadhaar number so I can check your scheme status.",
+    "hindi": "कृपया अपना आधार नंबर बताइए, ताकि मैं आपकी योजना की स्थिति जांच सकूं।",
+    "malayalam": "നിങ്ങളുടെ പദ്ധതി സ്ഥിതി പരിശോധിക്കാൻ ദയവായി ആധാർ നമ്പർ പറയൂ.",
+    "telugu": "మీ పథక స్థితిని తనిఖీ చేయడానికి దయచేసి మీ ఆధార్ నంబర్ చెప్పండి."
+}
 
-    data = db.get(user_id)
 
-    if not data: #if not data or data['name'].lower() != full_name:
-        return {
-            "english": "No record found matching the provided Aadhaar.",
-            "hindi": "प्रदान किए गए आधार और पूरा नाम के लिए कोई रिकॉर्ड नहीं मिला।",
-            "malayalam": "നൽകിയ ആദായവും മുഴുവൻ പേരും പൊരുത്തപ്പെടുന്ന രേഖയൊന്നും കണ്ടെത്തിയില്ല.",
-            "telugu": "నివ్వబడిన ఆధార్ మరియు పూర్తి పేరుతో సరిపోయే రికార్డు కనుగొనబడలేదు."
-        }[language_for_agent]
+llm_unavailable_messages = {
+    "english": "Sorry, I could not get an answer right now. Please ask again in a moment.",
+    "hindi": "क्षमा करें, अभी उत्तर नहीं मिल पाया। कृपया थोड़ी देर में फिर से पूछें।",
+    "malayalam": "ക്ഷമിക്കണം, ഇപ്പോൾ ഉത്തരം ലഭിച്ചില്ല. ദയവായി അൽപ്പസമയത്തിനു ശേഷം വീണ്ടും ചോദിക്കൂ.",
+    "telugu": "క్షమించండి, ఇప్పుడు సమాధానం పొందలేకపోయాను. దయచేసి కొద్దిసేపటి తర్వాత మళ్లీ అడగండి."
+}
+
+
+def lookup_scheme_record(user_id):
+    if user_id == 'unknown':
+        return None
+    return records.get_store().get(user_id)
+
+
+def has_record(user_id):
+    try:
+        return lookup_scheme_record(user_id) is not None
+    except Exception as e:
+        print(f"Record lookup failed: {e}")
+        return False
 
+
+def accept_user_id(found_id, status, known_user_id):
+    """found_id if it should replace known_user_id; a short id never replaces a valid Aadhaar."""
+    if status == 'valid':
+        return found_id
+    if status == 'short' and not is_valid_aadhaar(known_user_id):
+        return found_id
+    return known_user_id
+
+
+def render_scheme_status(data, language_for_agent):
     responses = {
         "english": f"{data['name']} is registered under the {data['scheme']} scheme. Last credit was {data['last_credit']}.",
         "hindi": f"{data['name']} {data['scheme']} योजना के अंतर्गत पंजीकृत हैं। अंतिम भुगतान {data['last_credit']} था।",
@@ -69,6 +125,54 @@ def get_scheme_info(user_data: dict, language_for_agent) -> str:
     return responses[language_for_agent]
 
 
+def get_scheme_info(user_data: dict, language_for_agent) -> str:
+    """
+    Looks up the user's scheme info in pragati.db by user_id (Aadhaar).
+    """
+    user_id = user_data['user_id']
+    # full_name = user_data.get('full_name', "").strip().lower()
+
+    data = lookup_scheme_record(user_id)
+
+    if not data: #if not data or data['name'].lower() != full_name:
+        return no_record_messages[language_for_agent]
+
+    return render_scheme_status(data, language_for_agent)
+
+
+def get_credit_history(user_id, language_for_agent, n=3):
+    credits = records.get_store().last_credits(user_id, n)
+    if not credits:
+        return None
+    items = ", ".join(c['text'] for c in credits)
+    return {
+        "english": f"Your last {len(credits)} credits: {items}.",
+        "hindi": f"आपके पिछले {len(credits)} भुगतान: {items}।",
+        "malayalam": f"നിങ്ങളുടെ അവസാന {len(credits)} ക്രെഡിറ്റുകൾ: {items}.",
+        "telugu": f"మీ చివరి {len(credits)} చెల్లింపులు: {items}."
+    }[language_for_agent]
+
+
+def template_answer(message, user_id, language_for_agent):
+    """
+    Answers status questions straight from the record, without an LLM call.
+    Returns None for anything open-ended so the caller falls back to the LLM.
+    """
+    intent = classify_intent(message)
+    if intent not in ('status', 'history'):
+        return None
+    if user_id == 'unknown':
+        return ask_aadhaar_messages[language_for_agent]
+    if intent == 'history':
+        history = get_credit_history(user_id, language_for_agent)
+        if history:
+            return history
+    data = lookup_scheme_record(user_id)
+    if not data:
+        return no_record_messages[language_for_agent]
+    return render_scheme_status(data, language_for_agent)
+
+
 
 
 def get_key_fn(base: BaseModel) -> dict:
@@ -95,8 +199,10 @@ def external_prompt(language_for_agent):
             " Ensure the user provides Aadhaar number so you can verify their identity."
             " This is private knowledge: {know_base}."
             " We retrieved the following user info: {context}."
+            " Relevant government scheme details: {schemes}."
             " Provide a clear, concise, and helpful answer regarding the user's scheme status or last transaction."
         )),
+        MessagesPlaceholder(variable_name="recent", optional=True),
         ("user", "{input}"),
     ])
 
@@ -114,6 +220,36 @@ def RExtract(pydantic_class, llm, prompt):
     return instruct_merge | prompt | llm | preparse | parser
 
 knowbase_getter = lambda x: RExtract(KnowledgeBase, instruct_llm, parser_prompt)
+knowbase_chain = RExtract(KnowledgeBase, instruct_llm, parser_prompt)
+
+def vector_schemes(message):
+    return retrieval.top_schemes(get_embedder().embed_query(message))
+
+
+def scheme_getter(message, k=2):
+    lexical_hits = lexical.top_schemes(message, k)
+    if RETRIEVAL_MODE != 'hybrid':
+        return "\n".join(lexical_hits)
+    try:
+        vector_hits = vector_pool.submit(vector_schemes, message).result(timeout=VECTOR_TIMEOUT)
+    except Exception as e:
+        print(f"Vector retrieval unavailable, using lexical results: {e!r}")
+        return "\n".join(lexical_hits)
+    return "\n".join(lexical.fuse(vector_hits, lexical_hits)[:k])
+
+
+async def ascheme_getter(message, k=2):
+    lexical_hits = lexical.top_schemes(message, k)
+    if RETRIEVAL_MODE != 'hybrid':
+        return "\n".join(lexical_hits)
+    try:
+        query_vector = await asyncio.wait_for(get_embedder().aembed_query(message), VECTOR_TIMEOUT)
+        vector_hits = retrieval.top_schemes(query_vector)
+    except Exception as e:
+        print(f"Vector retrieval unavailable, using lexical results: {e!r}")
+        return "\n".join(lexical_hits)
+    return "\n".join(lexical.fuse(vector_hits, lexical_hits)[:k])
+
 
 def database_getter(user_data):
     language_for_agent = user_data.get('language_for_agent')
@@ -135,24 +271,309 @@ external_chain = external_prompt | chat_llm
 
 
 
-state = {'know_base': KnowledgeBase()}
+def resolve_user_id(message, known_user_id='unknown', is_known=has_record):
+    """
+    Local replacement for the KnowledgeBase LLM parse. Returns (user_id, needs_llm):
+    needs_llm is only set when the user seems to be giving a number we couldn't read.
+    """
+    user_id, status = find_user_id(message, is_known)
+    if status in ('valid', 'short'):
+        return accept_user_id(user_id, status, known_user_id), False
+    needs_llm = status == 'partial' or (status == 'none' and mentions_aadhaar(message))
+    return known_user_id, needs_llm
+
+
+def refresh_knowledge_base(session, snapshot):
+    # Runs alongside the answer stream; only the session's next turn sees the result.
+    try:
+        know_base = knowbase_chain.invoke(snapshot)
+    except Exception as e:
+        print(f"Knowledge base update failed: {e}")
+        return
+    fields = know_base.model_dump(exclude={'user_id'})
+    user_id, status = find_user_id(know_base.user_id, has_record)
+    if status in ('valid', 'short'):
+        fields['user_id'] = accept_user_id(user_id, status, session.user_id)
+    session.update_knowledge(**fields)
+
+
+summary_prompt = ChatPromptTemplate.from_template(
+    "Update the running summary of a conversation between a rural citizen and a government scheme"
+    " assistant. Keep names, Aadhaar numbers, schemes, amounts, dates and open questions; drop"
+    " greetings. Answer with the summary only, in English, under 80 words."
+    "\n\nSUMMARY SO FAR: {summary}\n\nNEW TURNS:\n{turns}"
+)
 
-def chat_gen(message, language_for_agent, history=[], return_buffer=True):
-    global state
-    state['input'] = message
-    state['history'] = history
-    state['output'] = "" if not history else history[-1][1]
-    state['language_for_agent'] = language_for_agent
-    state['user_id'] = extract_aadhaar(message)  
 
-    state = internal_chain.invoke(state)
+def summarize_conversation(summary, turns):
+    text = "\n".join(f"User: {user_text}\nAgent: {agent_text}" for user_text, agent_text in turns)
+    return (summary_prompt | instruct_llm).invoke({'summary': summary or "(none)", 'turns': text})
+
+
+def start_turn(message, language_for_agent, history, session_id, is_known=has_record):
+    """Resolves the session and builds this turn's prompt state. Returns (session, state, needs_llm)."""
+    session = sessions.get_store().get(session_id, language_for_agent)
+    session.turns += 1
+    if session.memory is None:
+        session.memory = ConversationMemory(summarize=summarize_conversation)
+
+    user_id, needs_llm = resolve_user_id(message, session.user_id, is_known)
+    session.user_id = user_id
+    knowledge = session.knowledge()
+    # The prompt sees a bounded view of the conversation, not the whole history.
+    summary, recent = session.memory.prompt_view()
+    if summary:
+        knowledge['discussion_summary'] = summary
+    state = {
+        'input': message,
+        'history': history,
+        'output': "" if not history else history[-1][1],
+        'language_for_agent': language_for_agent,
+        'user_id': user_id,
+        'know_base': KnowledgeBase(**knowledge),
+        'recent': [m for user_text, agent_text in recent
+                   for m in (HumanMessage(content=user_text), AIMessage(content=agent_text))],
+    }
+    return session, state, needs_llm
+
+
+def chat_gen(message, language_for_agent, history=[], return_buffer=True, session_id=sessions.DEFAULT_SESSION):
+    session, state, needs_llm = start_turn(message, language_for_agent, history, session_id)
+    user_id = state['user_id']
+    state['context'] = database_getter(state)
+    if needs_llm:
+        threading.Thread(target=refresh_knowledge_base, args=(session, dict(state)), daemon=True).start()
+
+    answer = template_answer(message, user_id, language_for_agent)
+    if answer is not None:
+        print("[ Template answer ]")
+        session.memory.add_turn(message, answer)
+        yield answer
+        return
+
+    state['schemes'] = scheme_getter(message)
+
+    # Only turns that retrieved a scheme are self-contained enough to share;
+    # "and how do I apply for it?" depends on the conversation.
+    cache = response_cache.get_cache() if state['schemes'] else None
+    scope = response_cache.scope_key(language_for_agent, state['context'], state['schemes'])
+    if cache is not None:
+        cached = cache.lookup(message, scope)
+        if cached is not None:
+            print(f"[ Cached answer ] {cache.stats()}")
+            session.memory.add_turn(message, cached)
+            yield cached
+            return
 
     external_chain = external_prompt(language_for_agent) | chat_llm
 
+    start = time.perf_counter()
+    buffer = ""
+    completed = False
+    try:
+        for token in external_chain.stream(state):
+            buffer += token
+            yield buffer if return_buffer else token
+        completed = True
+    finally:
+        if buffer:
+            session.memory.add_turn(message, buffer if completed else buffer + " …")
+    if cache is not None:
+        cache.store(message, scope, buffer, time.perf_counter() - start)
+
+
+async def aknown_records(text):
+    """
+    The short numbers in text that have a record, looked up on a worker thread
+    within RECORD_TIMEOUT so SQLite never blocks the event loop. Returns a set
+    to use as find_user_id's is_known.
+    """
+    runs = [run for run in digit_runs(text) if 3 <= len(run) < 12]
+    if not runs:
+        return set()
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(lambda: {run for run in runs if has_record(run)}),
+                                      RECORD_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("Record lookup missed its deadline")
+        return set()
+
+
+async def arefresh_knowledge_base(session, snapshot):
+    try:
+        know_base = await asyncio.wait_for(knowbase_chain.ainvoke(snapshot), KNOWBASE_TIMEOUT)
+    except Exception as e:
+        print(f"Knowledge base update failed: {e!r}")
+        return
+    fields = know_base.model_dump(exclude={'user_id'})
+    known = await aknown_records(know_base.user_id)
+    user_id, status = find_user_id(know_base.user_id, known.__contains__)
+    if status in ('valid', 'short'):
+        fields['user_id'] = accept_user_id(user_id, status, session.user_id)
+    session.update_knowledge(**fields)
+
+
+def fallback_answer(message, state, cache, scope):
+    """What to say when the LLM misses its budget: a near cache hit, the user's record, or an apology."""
+    if cache is not None:
+        cached = cache.fallback_lookup(message, scope)
+        if cached is not None:
+            return cached
+    if lookup_scheme_record(state['user_id']):
+        return state['context']
+    return llm_unavailable_messages[state['language_for_agent']]
+
+
+# Keeps background knowledge-base tasks referenced until they finish.
+background_tasks = set()
+
+
+async def achat_gen(message, language_for_agent, history=[], return_buffer=True, session_id=sessions.DEFAULT_SESSION):
+    """
+    Async chat_gen. Each stage has its own deadline; if the LLM hasn't started
+    within FIRST_TOKEN_TIMEOUT (or the turn fails before any token), the turn
+    is answered from fallback_answer instead. A stall after the answer has
+    started just ends it. Closing the generator or cancelling its task aborts
+    the HTTP stream.
+    """
+    turn_deadline = time.perf_counter() + TURN_TIMEOUT
+    known = await aknown_records(message)
+    session, state, needs_llm = start_turn(message, language_for_agent, history, session_id, known.__contains__)
+    user_id = state['user_id']
+    try:
+        state['context'] = await asyncio.wait_for(asyncio.to_thread(database_getter, state), RECORD_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("Record lookup missed its deadline")
+        state['context'] = no_record_messages[language_for_agent]
+    if needs_llm:
+        task = asyncio.create_task(arefresh_knowledge_base(session, dict(state)))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    try:
+        answer = await asyncio.wait_for(asyncio.to_thread(template_answer, message, user_id, language_for_agent),
+                                        RECORD_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("Template answer missed its deadline, asking the LLM")
+        answer = None
+    if answer is not None:
+        print("[ Template answer ]")
+        session.memory.add_turn(message, answer)
+        yield answer
+        return
+
+    state['schemes'] = await ascheme_getter(message)
+
+    cache = response_cache.get_cache() if state['schemes'] else None
+    scope = response_cache.scope_key(language_for_agent, state['context'], state['schemes'])
+    if cache is not None:
+        cached = cache.lookup(message, scope)
+        if cached is not None:
+            print(f"[ Cached answer ] {cache.stats()}")
+            session.memory.add_turn(message, cached)
+            yield cached
+            return
+
+    external_chain = external_prompt(language_for_agent) | chat_llm
+    stream = external_chain.astream(state).__aiter__()
+    start = time.perf_counter()
     buffer = ""
-    for token in external_chain.stream(state):
-        buffer += token
-        yield buffer if return_buffer else token
+    completed = False
+    try:
+        while True:
+            budget = FIRST_TOKEN_TIMEOUT if not buffer else TOKEN_TIMEOUT
+            budget = min(budget, turn_deadline - time.perf_counter())
+            try:
+                token = await asyncio.wait_for(stream.__anext__(), max(budget, 0.0))
+            except StopAsyncIteration:
+                completed = True
+                break
+            except Exception as e:
+                print(f"LLM stream stopped: {e!r}")
+                break
+            buffer += token
+            yield buffer if return_buffer else token
+    finally:
+        await stream.aclose()
+        if buffer:
+            # Cut short by barge-in or a stall: remember what the user actually got.
+            session.memory.add_turn(message, buffer if completed else buffer + " …")
+
+    if not buffer:
+        try:
+            answer = await asyncio.wait_for(asyncio.to_thread(fallback_answer, message, state, cache, scope),
+                                            RECORD_TIMEOUT)
+        except asyncio.TimeoutError:
+            answer = llm_unavailable_messages[language_for_agent]
+        print("[ Fallback answer ]")
+        session.memory.add_turn(message, answer)
+        yield answer
+    elif completed and cache is not None:
+        await asyncio.to_thread(cache.store, message, scope, buffer, time.perf_counter() - start)
+
+
+_llm_loop = None
+_llm_loop_lock = threading.Lock()
+
+
+def get_llm_loop():
+    """One event loop, on a daemon thread, shared by every achat_gen turn started from sync code."""
+    global _llm_loop
+    with _llm_loop_lock:
+        if _llm_loop is None:
+            _llm_loop = asyncio.new_event_loop()
+            threading.Thread(target=_llm_loop.run_forever, name="llm-loop", daemon=True).start()
+        return _llm_loop
+
+
+class SyncStream:
+    """
+    Iterates an async generator from a plain thread. cancel() may be called
+    from any other thread: it cancels the pending step on the LLM loop, which
+    aborts the underlying HTTP stream, and iteration then simply ends.
+    """
+
+    def __init__(self, agen):
+        self.agen = agen
+        self.pending = None
+        self.step = None
+        self.cancelled = threading.Event()
+
+    async def _next(self):
+        # The step is its own task so _close() can wait for it to finish unwinding.
+        self.step = asyncio.ensure_future(self.agen.__anext__())
+        return await self.step
+
+    async def _close(self):
+        step = self.step
+        if step is not None and not step.done():
+            # aclose() on a generator whose cancelled step is still running
+            # raises "asynchronous generator is already running".
+            await asyncio.wait({step})
+        await self.agen.aclose()
+
+    def __iter__(self):
+        loop = get_llm_loop()
+        try:
+            while not self.cancelled.is_set():
+                self.pending = asyncio.run_coroutine_threadsafe(self._next(), loop)
+                try:
+                    yield self.pending.result()
+                except (StopAsyncIteration, concurrent.futures.CancelledError):
+                    return
+        finally:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+
+    def cancel(self):
+        self.cancelled.set()
+        pending = self.pending
+        if pending is not None:
+            pending.cancel()
+
+
+def stream_sync(agen):
+    return SyncStream(agen)
+
 
 def queue_streaming(chat_stream, history = [], max_questions=8):
     for human_msg, agent_msg in history:
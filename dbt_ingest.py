@@ -0,0 +1,227 @@
+import csv
+import itertools
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from records import DB_PATH
+
+
+BATCH_SIZE = 50_000
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# DBT payment ledger. latest_credit is a denormalized
+# copy of each user's newest row so "last credit" is one primary-key seek.
+CREDIT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS credits (
+    user_id TEXT NOT NULL,
+    credit_date TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    scheme TEXT,
+    reference TEXT NOT NULL
+);
+-- A payment file delivered twice (or overlapping exports) must not double-count.
+-- Its leading (user_id, credit_date) also serves records.LAST_CREDITS_SQL, so
+-- it is the only index on credits; earlier databases also had idx_credits_user_date.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_credits_reference ON credits (user_id, credit_date, reference);
+DROP INDEX IF EXISTS idx_credits_user_date;
+CREATE TABLE IF NOT EXISTS latest_credit (
+    user_id TEXT PRIMARY KEY,
+    credit_date TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    scheme TEXT
+);
+"""
+
+# The demo customers, keyed by the numeric ids a caller can actually say: the
+# ids shipped in pragati.db ('ramesh', 'aadhaar123') can't be spoken as digits.
+CUSTOMERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    scheme TEXT,
+    last_credit TEXT,
+    auth_secret TEXT
+);
+"""
+DEMO_CUSTOMERS = (
+    ("426456", "Sita", "NREGA", "₹2500 on 15-Aug", None),
+    ("13456", "Ramesh", "PM-Kisan", "₹2000 on 23-Aug", None),
+)
+
+INGESTED_FILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    PRIMARY KEY (path, size, mtime)
+);
+"""
+
+# Keeps latest_credit current for the users touched by one batch.
+REFRESH_LATEST_SQL = """
+INSERT INTO latest_credit (user_id, credit_date, amount, scheme)
+SELECT user_id, credit_date, amount, scheme FROM staged_latest WHERE true
+ON CONFLICT (user_id) DO UPDATE SET
+    credit_date = excluded.credit_date,
+    amount = excluded.amount,
+    scheme = excluded.scheme
+WHERE excluded.credit_date >= latest_credit.credit_date
+"""
+
+
+def connect(path=DB_PATH):
+    # The app only ever opens the database read-only: the ledger tables and WAL
+    # mode (so lookups keep running during a load) are set up here.
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.executescript(CREDIT_SCHEMA)
+    conn.executescript(INGESTED_FILES_SCHEMA)
+    return conn
+
+
+def parse_amount(value):
+    """'₹2,500' / '2500.00' / 2500 -> 2500 (whole rupees)."""
+    if isinstance(value, (int, float)):
+        return int(round(value))
+    cleaned = str(value).replace('₹', '').replace(',', '').replace('Rs.', '').strip()
+    return int(round(float(cleaned)))
+
+
+def parse_credit_date(value):
+    """'2025-08-15' -> '2025-08-15'. Anything else raises ValueError: dates are compared as text."""
+    day = str(value).strip()
+    if not ISO_DATE.fullmatch(day):
+        raise ValueError(f"credit_date {day!r} is not YYYY-MM-DD")
+    time.strptime(day, "%Y-%m-%d")
+    return day
+
+
+def read_rows(path, rejected=None):
+    """
+    Streams (user_id, credit_date, amount, scheme, reference) from a CSV or
+    JSONL file. Unparseable lines and rows with a missing field, a bad date
+    or no reference are skipped and counted in rejected.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            records = (line for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for line, rec in enumerate(records, 1):
+            try:
+                if isinstance(rec, str):
+                    rec = json.loads(rec)
+                reference = str(rec.get('reference') or '').strip()
+                if not reference:
+                    raise ValueError("no reference")
+                row = (
+                    str(rec['user_id']).strip(),
+                    parse_credit_date(rec['credit_date']),
+                    parse_amount(rec['amount']),
+                    rec.get('scheme') or None,
+                    reference,
+                )
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                if rejected is not None:
+                    if not rejected:
+                        print(f"  rejecting record {line} of {path}: {e}")
+                    rejected.append(line)
+                continue
+            yield row
+
+
+def ingest(path, db_path=DB_PATH, batch_size=BATCH_SIZE):
+    conn = connect(db_path)
+    st = os.stat(path)
+    file_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    if conn.execute("SELECT 1 FROM ingested_files WHERE path = ? AND size = ? AND mtime = ?", file_key).fetchone():
+        print(f"{path} was already ingested, skipping.")
+        conn.close()
+        return 0, 0.0
+    conn.execute("""CREATE TEMP TABLE IF NOT EXISTS staged_latest (
+        user_id TEXT PRIMARY KEY, credit_date TEXT, amount INTEGER, scheme TEXT)""")
+    start = time.perf_counter()
+    total = 0
+    inserted = 0
+    rejected = []
+    rows = read_rows(path, rejected)
+    try:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            with conn:
+                inserted += conn.executemany(
+                    "INSERT OR IGNORE INTO credits (user_id, credit_date, amount, scheme, reference) "
+                    "VALUES (?, ?, ?, ?, ?)", batch).rowcount
+                # Newest credit per user within this batch, then merge into the view.
+                conn.execute("DELETE FROM staged_latest")
+                conn.executemany(
+                    "INSERT INTO staged_latest VALUES (?, ?, ?, ?) ON CONFLICT (user_id) DO UPDATE SET "
+                    "credit_date = excluded.credit_date, amount = excluded.amount, scheme = excluded.scheme "
+                    "WHERE excluded.credit_date >= staged_latest.credit_date",
+                    (row[:4] for row in batch))
+                conn.execute(REFRESH_LATEST_SQL)
+            total += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"  {total} rows, {total / elapsed:,.0f} rows/s")
+        conn.execute("ANALYZE")
+        with conn:
+            conn.execute("INSERT INTO ingested_files VALUES (?, ?, ?, ?)", file_key + (total,))
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Ingested {total} rows from {path} in {elapsed:.1f}s ({rate:,.0f} rows/s): "
+          f"{inserted} new, {total - inserted} already present, {len(rejected)} rejected")
+    return total, rate
+
+
+def seed_demo_customers(db_path=DB_PATH):
+    """Adds DEMO_CUSTOMERS to the customers table; existing ids are left alone."""
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executescript(CUSTOMERS_SCHEMA)
+            added = conn.executemany("INSERT OR IGNORE INTO customers VALUES (?, ?, ?, ?, ?)",
+                                     DEMO_CUSTOMERS).rowcount
+    finally:
+        conn.close()
+    print(f"Seeded {added} demo customers into {db_path}")
+    return added
+
+
+def write_sample_file(path, n_rows, n_users=100_000):
+    import random
+    rng = random.Random(0)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['user_id', 'credit_date', 'amount', 'scheme', 'reference'])
+        for i in range(n_rows):
+            writer.writerow([
+                f"{200000000000 + rng.randrange(n_users)}",
+                f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                rng.choice((2000, 2500, 3000)),
+                rng.choice(('NREGA', 'PM-Kisan')),
+                f"TXN{i:010d}",
+            ])
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--seed-demo"]:
+        seed_demo_customers()
+    elif len(sys.argv) > 1:
+        for payment_file in sys.argv[1:]:
+            ingest(payment_file)
+    else:
+        sample, db = "bench_credits.csv", "bench_credits.db"
+        if not os.path.exists(sample):
+            write_sample_file(sample, 1_000_000)
+        ingest(sample, db_path=db)
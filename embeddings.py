@@ -1,66 +1,216 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
 import os
-from dotenv import load_dotenv
-from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from operator import itemgetter
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+import time
 
-load_dotenv()
-os.environ.get("NVIDIA_API_KEY")
+import numpy as np
 
+import retrieval
 
-embedder = NVIDIAEmbeddings(model="nvidia/nv-embed-v1")
 
-instruct_llm = ChatNVIDIA(model="mistralai/mixtral-8x7b-instruct-v0.1")
+MODEL = "nvidia/nv-embed-v1"
+STORE_PATH = os.path.join("embeddings", "schemes_embeddings.jsonl")
+LEGACY_JSON = os.path.join("embeddings", "schemes_embeddings.json")
+BATCH_SIZE = 16
+MAX_CONCURRENCY = 4
 
 
-def read_schemes_file():
+def read_schemes_file(path="schemes.txt"):
     schemes = []
-    with open("schemes.txt", "r", encoding="utf-8") as file:
+    with open(path, "r", encoding="utf-8") as file:
         content = file.read().strip()
-        
+
         scheme_blocks = content.split('\n\n')
         for block in scheme_blocks:
-            
+
             cleaned_block = block.strip()
             if cleaned_block:
                 schemes.append(cleaned_block)
     return schemes
 
 
-schemes = read_schemes_file()
-
-
-queries = [f"Tell me about the {scheme.split(':')[0]}" for scheme in schemes]
-
-
-q_embeddings = [embedder.embed_query(query) for query in queries]
-
-
-d_embeddings = embedder.embed_documents(schemes)
-
-
-import json
-import os
-
-
-if not os.path.exists("embeddings"):
-    os.makedirs("embeddings")
-
-
-data = {
-    "schemes": schemes,
-    "query_embeddings": q_embeddings,
-    "scheme_embeddings": d_embeddings
-}
-
-with open("embeddings/schemes_embeddings.json", "w", encoding="utf-8") as file:
-    json.dump(data, file, indent=2)
-
-print(f"Processed {len(schemes)} schemes and created embeddings.")
-print("Embeddings saved to embeddings/schemes_embeddings.json")
-
+def query_for(scheme):
+    return f"Tell me about the {scheme.split(':')[0]}"
+
+
+def content_hash(kind, text, model=MODEL):
+    return hashlib.sha256(f"{model}\0{kind}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+class EmbeddingStore:
+    """
+    Append-only JSONL of {hash, kind, text, embedding}. New vectors are appended,
+    never rewritten; on load the last line for a hash wins. A run killed
+    mid-append leaves a torn last line: it is cut off on load so the next
+    append starts on a clean line, and those vectors are simply fetched again.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.vectors = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        good_end = 0
+        skipped = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        entry = json.loads(line)
+                        self.vectors[entry["hash"]] = entry["embedding"]
+                    except (ValueError, KeyError, TypeError):
+                        skipped += 1
+                        continue
+                if line.endswith(b"\n"):
+                    good_end = f.tell()
+            size = f.tell()
+        if skipped:
+            print(f"Skipped {skipped} malformed line(s) in {self.path}")
+        if good_end < size:
+            with open(self.path, "r+b") as f:
+                f.truncate(good_end)
+
+    def __contains__(self, key):
+        return key in self.vectors
+
+    def get(self, key):
+        return self.vectors[key]
+
+    def append(self, entries):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    self.vectors[entry["hash"]] = entry["embedding"]
+
+    def import_legacy_json(self, json_path=LEGACY_JSON, model=MODEL):
+        """Seeds the store from the old all-in-one JSON so existing vectors aren't re-bought."""
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entries = []
+        for scheme, doc, query in zip(data["schemes"], data["scheme_embeddings"], data["query_embeddings"]):
+            entries.append({"hash": content_hash("document", scheme, model), "kind": "document",
+                            "text": scheme, "embedding": doc})
+            text = query_for(scheme)
+            entries.append({"hash": content_hash("query", text, model), "kind": "query",
+                            "text": text, "embedding": query})
+        self.append(entries)
+        return len(entries)
+
+
+class FakeEmbedder:
+    """Deterministic local stand-in for NVIDIAEmbeddings (same methods), for offline runs."""
+
+    def __init__(self, dim=64, delay=0.0):
+        self.dim = dim
+        self.delay = delay
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        if self.delay:
+            time.sleep(self.delay)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self._vector("query:" + text)
+
+
+def _embed_batch(embedder, kind, texts):
+    if kind == "document":
+        return embedder.embed_documents(texts)
+    # Queries use the query input type, which the client only exposes one at a time.
+    return [embedder.embed_query(text) for text in texts]
+
+
+def update_embeddings(embedder, schemes, store, model=MODEL, batch_size=BATCH_SIZE, max_concurrency=MAX_CONCURRENCY):
+    wanted = []
+    for scheme in schemes:
+        wanted.append(("document", scheme))
+        wanted.append(("query", query_for(scheme)))
+    todo = {}
+    skipped = 0
+    for kind, text in wanted:
+        key = content_hash(kind, text, model)
+        if key in store:
+            skipped += 1
+        else:
+            todo.setdefault(kind, {})[key] = text
+
+    batches = []
+    for kind, items in todo.items():
+        keys = list(items)
+        for i in range(0, len(keys), batch_size):
+            batches.append((kind, keys[i:i + batch_size], [items[k] for k in keys[i:i + batch_size]]))
+
+    start = time.perf_counter()
+    embedded = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = {pool.submit(_embed_batch, embedder, kind, texts): (kind, keys, texts)
+                   for kind, keys, texts in batches}
+        for future in concurrent.futures.as_completed(futures):
+            kind, keys, texts = futures[future]
+            vectors = future.result()
+            store.append([{"hash": k, "kind": kind, "text": t, "embedding": v}
+                          for k, t, v in zip(keys, texts, vectors)])
+            embedded += len(vectors)
+    elapsed = time.perf_counter() - start
+    rate = embedded / elapsed if elapsed > 0 else 0.0
+    print(f"Embedded {embedded} texts in {elapsed:.2f}s ({rate:.1f} embeddings/s), "
+          f"skipped {skipped} unchanged.")
+    return embedded, skipped
+
+
+def write_retrieval_index(schemes, store, model=MODEL, prefix=retrieval.INDEX_PREFIX):
+    vectors, row_to_scheme = [], []
+    for i, scheme in enumerate(schemes):
+        vectors.append(store.get(content_hash("document", scheme, model)))
+        vectors.append(store.get(content_hash("query", query_for(scheme), model)))
+        row_to_scheme += [i, i]
+    st = os.stat(store.path)
+    retrieval.write_index(prefix, vectors, row_to_scheme, schemes,
+                          source={"path": store.path, "size": st.st_size, "mtime": st.st_mtime})
+    print(f"Wrote retrieval index for {len(schemes)} schemes to {prefix}.npy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally embed schemes.txt")
+    parser.add_argument("--fake", action="store_true", help="use the deterministic local embedder")
+    parser.add_argument("--store", help=f"JSONL vector store (default {STORE_PATH})")
+    parser.add_argument("--index", help=f"retrieval index prefix (default {retrieval.INDEX_PREFIX})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.fake:
+        embedder, model = FakeEmbedder(), "fake"
+    else:
+        from dotenv import load_dotenv
+        from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
+        load_dotenv()
+        embedder, model = NVIDIAEmbeddings(model=MODEL), MODEL
+
+    # Fake vectors must never land in the store or index the assistant reads.
+    suffix = "_fake" if args.fake else ""
+    store = EmbeddingStore(args.store or STORE_PATH.replace(".jsonl", suffix + ".jsonl"))
+    if not store.vectors and model == MODEL and os.path.exists(LEGACY_JSON):
+        print(f"Imported {store.import_legacy_json()} vectors from {LEGACY_JSON}")
+
+    schemes = read_schemes_file()
+    update_embeddings(embedder, schemes, store, model, args.batch_size, args.concurrency)
+    write_retrieval_index(schemes, store, model, prefix=args.index or retrieval.INDEX_PREFIX + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import re
+
+from aadhaar import find_user_id, digit_runs
+
+
+# Cues per language. English cues are whole words (an optional plural 's' is
+# allowed), so "how" does not fire inside "show". Indic cues must start a word
+# but may run on, because suffixes attach directly to the stem ("पैसा" / "पैसे",
+# "గత" / "గతంలో"), while "గత" inside "స్వాగతం" is not a cue.
+STATUS_CUES = (
+    # English
+    'money', 'credit', 'payment', 'paid', 'arrived', 'received', 'status', 'installment', 'instalment', 'transfer',
+    # Hindi
+    'पैसा', 'पैसे', 'भुगतान', 'क्रेडिट', 'किस्त', 'आया', 'आई', 'मिला', 'स्थिति', 'स्टेटस', 'जमा',
+    # Malayalam
+    'പണം', 'പൈസ', 'ക്രെഡിറ്റ്', 'വന്നോ', 'വന്നു', 'ലഭിച്ചോ', 'കിട്ടിയോ', 'സ്ഥിതി', 'തുക', 'ഗഡു',
+    # Telugu
+    'డబ్బు', 'చెల్లింపు', 'క్రెడిట్', 'వచ్చిందా', 'వచ్చాయా', 'వచ్చింది', 'జమ', 'స్థితి', 'వాయిదా',
+)
+
+# "Show my last few payments" - answered from the credits ledger.
+HISTORY_CUES = (
+    'last three', 'last 3', 'last few', 'history', 'all credits', 'all payments', 'previous payments',
+    'पिछले', 'इतिहास', 'सारे भुगतान',
+    'മുൻ', 'ചരിത്രം', 'കഴിഞ്ഞ',
+    'గత', 'చరిత్ర', 'అన్ని చెల్లింపులు',
+)
+
+# Questions that need an explanation rather than the record: leave these to the LLM.
+OPEN_CUES = (
+    'how', 'what', 'why', 'when will', 'apply', 'eligible', 'eligibility', 'document', 'explain', 'tell me about',
+    'कैसे', 'क्यों', 'क्या है', 'आवेदन', 'पात्र', 'दस्तावेज', 'बताइए', 'बताओ',
+    'എങ്ങനെ', 'എന്താണ്', 'എന്തുകൊണ്ട്', 'അപേക്ഷ', 'യോഗ്യ', 'രേഖകൾ',
+    'ఎలా', 'ఏమిటి', 'ఎందుకు', 'దరఖాస్తు', 'అర్హత', 'పత్రాలు',
+)
+
+
+def cue_matcher(cues):
+    latin = [re.escape(cue) for cue in cues if cue.isascii()]
+    word = re.compile(r'\b(?:' + '|'.join(latin) + r')s?\b')
+    indic = [re.escape(cue) for cue in cues if not cue.isascii()]
+    # Vowel signs are not \w, so a word start is spelled out as space or punctuation.
+    word_start = re.compile(r'(?:^|(?<=[\s.,!?।॥:;"\'()\[\]-]))(?:' + '|'.join(indic) + ')')
+    return lambda lowered: bool(word.search(lowered)) or bool(word_start.search(lowered))
+
+
+is_open = cue_matcher(OPEN_CUES)
+is_history = cue_matcher(HISTORY_CUES)
+is_status = cue_matcher(STATUS_CUES)
+
+
+def classify_intent(message: str) -> str:
+    """
+    Returns 'status' for "has my money arrived"-style questions (or a bare
+    Aadhaar reply), 'history' for questions about recent payments, otherwise 'open'.
+    """
+    lowered = message.lower()
+    if is_open(lowered):
+        return 'open'
+    if is_history(lowered):
+        return 'history'
+    if is_status(lowered):
+        return 'status'
+    _, status = find_user_id(message)
+    if status in ('valid', 'short'):
+        # "It is 4264 5678 9012" in reply to the agent asking for the number.
+        words = [w for w in message.split() if not any(c.isdigit() for c in w)]
+        if len(words) - sum(len(run) for run in digit_runs(message)) <= 4:
+            return 'status'
+    return 'open'
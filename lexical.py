@@ -0,0 +1,229 @@
+import json
+import math
+import os
+import sys
+import threading
+import time
+import unicodedata
+
+
+SCHEMES_PATH = "schemes.txt"
+ALIASES_PATH = "scheme_aliases.json"
+INDEX_PATH = os.path.join("embeddings", "schemes_lexical.json")
+K1 = 1.2
+B = 0.75
+
+SCRIPTS = (
+    ('deva', 0x0900, 0x097F),
+    ('telu', 0x0C00, 0x0C7F),
+    ('mlym', 0x0D00, 0x0D7F),
+)
+SEPARATORS = {'।', '॥'}  # danda, double danda
+JOINERS = {'‌', '‍'}     # ZWNJ / ZWJ only change rendering
+
+ENGLISH_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'are', 'was', 'be', 'by', 'with',
+    'me', 'my', 'i', 'you', 'your', 'it', 'this', 'that', 'what', 'about', 'tell', 'please', 'can', 'do',
+    'does', 'how', 'they', 'their', 'any', 'all', 'per', 'as', 'at', 'from', 'should', 'use', 'rest',
+}
+
+# Malayalam words end in a virama or samvruthokaram that case endings replace.
+TRAILING_MARKS = {'mlym': ('്', 'ു')}
+
+# Case and postposition endings, longest first. Stripped from both documents
+# and queries so "किसानों" matches "किसान" and "പഞ്ചായത്തിൽ" matches "പഞ്ചായത്ത്".
+SUFFIXES = {
+    'deva': ('ियों', 'ियां', 'ाओं', 'ाएं', 'ों', 'ें', 'ीं'),
+    'mlym': ('ിന്റെ', 'ുകൾ', 'ങ്ങൾ', 'ിലെ', 'ുടെ', 'ായി', 'ിൽ', 'ക്ക്', 'ിന്'),
+    'telu': ('లలో', 'లకు', 'లో', 'కు', 'కి', 'ను', 'ని', 'లు', 'ము', 'ం'),
+}
+
+
+def script_of(ch):
+    if ch in SEPARATORS:
+        return None
+    if ch.isascii():
+        return 'latn' if ch.isalnum() else None
+    code = ord(ch)
+    for name, lo, hi in SCRIPTS:
+        if lo <= code <= hi:
+            return name
+    return 'latn' if ch.isalnum() else None
+
+
+def _stem(token, script):
+    if script == 'latn':
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            return token[:-1]
+        return token
+    for suffix in SUFFIXES.get(script, ()):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            token = token[:-len(suffix)]
+            break
+    for mark in TRAILING_MARKS.get(script, ()):
+        if token.endswith(mark) and len(token) > 2:
+            token = token[:-len(mark)]
+    return token
+
+
+def tokenize(text):
+    """
+    Splits on script changes as well as on spaces and punctuation. Python's
+    \\w does not cover Indic vowel signs and viramas, so runs are built from
+    Unicode block ranges instead of a regex.
+    """
+    text = unicodedata.normalize('NFC', text)
+    tokens = []
+    current, current_script = [], None
+    for ch in text + ' ':
+        if ch in JOINERS:
+            continue
+        script = script_of(ch)
+        if script != current_script and current:
+            token = ''.join(current).lower()
+            if not (current_script == 'latn' and token in ENGLISH_STOPWORDS):
+                tokens.append(_stem(token, current_script))
+            current = []
+        current_script = script
+        if script is not None:
+            current.append(ch)
+    return tokens
+
+
+def read_corpus(schemes_path=SCHEMES_PATH, aliases_path=ALIASES_PATH):
+    """Returns (schemes, documents): each document is the scheme text plus its translations."""
+    with open(schemes_path, "r", encoding="utf-8") as f:
+        schemes = [block.strip() for block in f.read().strip().split('\n\n') if block.strip()]
+    aliases = {}
+    if os.path.exists(aliases_path):
+        with open(aliases_path, "r", encoding="utf-8") as f:
+            aliases = json.load(f)
+    documents = []
+    for scheme in schemes:
+        name = scheme.split(':')[0].strip()
+        documents.append(" ".join([scheme] + list(aliases.get(name, {}).values())))
+    return schemes, documents
+
+
+class LexicalIndex:
+    """BM25 over an inverted index of {term: [[doc, tf], ...]}."""
+
+    def __init__(self, schemes, doc_len, postings, source=None):
+        self.schemes = schemes
+        self.doc_len = doc_len
+        self.postings = postings
+        self.source = source
+        self.avgdl = sum(doc_len) / len(doc_len) if doc_len else 0.0
+        n = len(doc_len)
+        self.idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in postings.items()}
+
+    @classmethod
+    def build(cls, schemes, documents, source=None):
+        postings, doc_len = {}, []
+        for doc_id, document in enumerate(documents):
+            counts = {}
+            for token in tokenize(document):
+                counts[token] = counts.get(token, 0) + 1
+            doc_len.append(sum(counts.values()))
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append([doc_id, tf])
+        return cls(schemes, doc_len, postings, source)
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"schemes": self.schemes, "doc_len": self.doc_len, "postings": self.postings,
+                       "source": self.source}, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["schemes"], data["doc_len"], data["postings"], data.get("source"))
+
+    def search(self, query, k=3):
+        """Returns [(scheme_index, score)] best first; documents sharing no term are left out."""
+        scores = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf[token]
+            for doc_id, tf in postings:
+                norm = K1 * (1 - B + B * self.doc_len[doc_id] / self.avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+def fuse(*rankings, k=60):
+    """Reciprocal rank fusion of several best-first lists of scheme texts."""
+    scores = {}
+    for ranking in rankings:
+        for rank, scheme in enumerate(ranking):
+            scores[scheme] = scores.get(scheme, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda scheme: -scores[scheme])
+
+
+def _source_stamp(paths):
+    stamp = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp[path] = [st.st_size, st.st_mtime]
+        except OSError:
+            stamp[path] = None
+    return stamp
+
+
+def build_index(path=INDEX_PATH):
+    schemes, documents = read_corpus()
+    index = LexicalIndex.build(schemes, documents, source=_source_stamp([SCHEMES_PATH, ALIASES_PATH]))
+    index.save(path)
+    print(f"Built lexical index with {len(index.postings)} terms for {len(schemes)} schemes at {path}")
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = LexicalIndex.load()
+                if _index.source != _source_stamp([SCHEMES_PATH, ALIASES_PATH]):
+                    _index = build_index()
+            except (OSError, ValueError, KeyError):
+                _index = build_index()
+        return _index
+
+
+def top_schemes(message, k=2, relative_cutoff=0.3):
+    index = get_index()
+    hits = index.search(message, k)
+    if not hits:
+        return []
+    best = hits[0][1]
+    return [index.schemes[i] for i, score in hits if score >= best * relative_cutoff]
+
+
+if __name__ == "__main__":
+    build_index()
+    t0 = time.perf_counter()
+    index = LexicalIndex.load()
+    print(f"Loaded in {(time.perf_counter() - t0) * 1000:.2f} ms")
+    queries = sys.argv[1:] or [
+        "What is PM-Kisan?",
+        "how many days of work under nrega",
+        "पीएम किसान की किस्त कब आएगी",
+        "മനരേഗ തൊഴിലുറപ്പ് കൂലി പഞ്ചായത്തിൽ",
+        "పెన్షన్ పథకం గురించి చెప్పండి",
+    ]
+    for query in queries:
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            hits = index.search(query, 2)
+        per_query = (time.perf_counter() - t0) / 1000 * 1e6
+        print(f"{per_query:7.1f} us  {query!r} -> {[(index.schemes[i].split(':')[0], round(s, 2)) for i, s in hits]}")
@@ -0,0 +1,150 @@
+import threading
+
+from lexical import script_of
+
+
+PROMPT_BUDGET_TOKENS = 1200   # summary + verbatim turns
+SUMMARY_BUDGET_TOKENS = 300
+KEEP_TURNS = 4
+MAX_TURNS = 12               # turns held while summaries keep failing; the oldest go first
+
+# Rough tokens per character for Mixtral's SentencePiece vocabulary. Latin
+# text packs ~4 chars per token; Indic scripts are mostly byte fallbacks, so
+# Malayalam and Telugu cost more than one token per character.
+TOKENS_PER_CHAR = {
+    'latn': 0.25,
+    'deva': 0.7,
+    'telu': 1.2,
+    'mlym': 1.4,
+    None: 0.3,    # spaces, digits' neighbours, punctuation
+}
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    cost = 0.0
+    for ch in text:
+        cost += TOKENS_PER_CHAR.get(script_of(ch), TOKENS_PER_CHAR[None])
+    return int(cost) + 1
+
+
+def truncate_to_tokens(text, budget):
+    """Keeps the end of text (the most recent facts) within budget."""
+    if estimate_tokens(text) <= budget:
+        return text
+    kept, cost = [], 0.0
+    for ch in reversed(text):
+        cost += TOKENS_PER_CHAR.get(script_of(ch), TOKENS_PER_CHAR[None])
+        if cost > budget:
+            break
+        kept.append(ch)
+    return "…" + "".join(reversed(kept)).lstrip()
+
+
+class ConversationMemory:
+    """
+    Rolling memory for one conversation: the last keep_turns turns verbatim
+    plus a running summary of everything older. Turns that fall out of the
+    verbatim window are folded into the summary by summarize(summary, turns)
+    on a background thread, then dropped, so both the prompt and this object
+    stay the same size however long the session runs. If summarize keeps
+    failing, turns beyond max_turns are dropped unsummarized, oldest first.
+    """
+
+    def __init__(self, summarize=None, budget_tokens=PROMPT_BUDGET_TOKENS,
+                 summary_tokens=SUMMARY_BUDGET_TOKENS, keep_turns=KEEP_TURNS, max_turns=MAX_TURNS):
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.keep_turns = keep_turns
+        self.max_turns = max(max_turns, keep_turns)
+        self.summary = ""
+        self.turns = []
+        self.lock = threading.Lock()
+        self.folding = False
+        self.folds = 0
+        self.dropped = 0
+        self.dropped_while_folding = 0
+
+    def add_turn(self, user_text, agent_text):
+        with self.lock:
+            self.turns.append((user_text or "", agent_text or ""))
+            excess = len(self.turns) - self.max_turns
+            if excess > 0:
+                del self.turns[:excess]
+                self.dropped += excess
+                if self.folding:
+                    self.dropped_while_folding += excess
+        self._maybe_fold()
+
+    def prompt_view(self):
+        """Returns (summary, recent turns oldest first) within the token budget."""
+        with self.lock:
+            summary = self.summary
+            turns = list(self.turns)
+        remaining = self.budget_tokens - estimate_tokens(summary)
+        recent = []
+        for user_text, agent_text in reversed(turns[-self.keep_turns:]):
+            cost = estimate_tokens(user_text) + estimate_tokens(agent_text)
+            if cost > remaining:
+                break
+            recent.append((user_text, agent_text))
+            remaining -= cost
+        recent.reverse()
+        return summary, recent
+
+    def prompt_tokens(self):
+        summary, recent = self.prompt_view()
+        return estimate_tokens(summary) + sum(estimate_tokens(u) + estimate_tokens(a) for u, a in recent)
+
+    def _maybe_fold(self):
+        with self.lock:
+            if self.folding or len(self.turns) <= self.keep_turns:
+                return
+            older = self.turns[:-self.keep_turns]
+            summary = self.summary
+            self.folding = True
+            self.dropped_while_folding = 0
+        if self.summarize is None:
+            self._finish_fold(older, summary)
+            return
+        threading.Thread(target=self._fold, args=(older, summary), daemon=True).start()
+
+    def _fold(self, older, summary):
+        try:
+            summary = self.summarize(summary, older)
+        except Exception as e:
+            print(f"Conversation summary failed, keeping the previous one: {e!r}")
+            with self.lock:
+                self.folding = False
+            return
+        self._finish_fold(older, summary)
+
+    def _finish_fold(self, older, summary):
+        with self.lock:
+            # Turns added while the summary was being written stay in the window;
+            # folded turns the cap already dropped are not there to remove.
+            del self.turns[:max(len(older) - self.dropped_while_folding, 0)]
+            self.summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+            self.folding = False
+            self.folds += 1
+        self._maybe_fold()
+
+
+def plain_summarize(summary, turns):
+    """LLM-free fallback: keeps the user's side of each folded turn."""
+    notes = [summary] if summary else []
+    notes += [f"User asked: {user_text}" for user_text, _ in turns if user_text]
+    return " ".join(notes)
+
+
+if __name__ == "__main__":
+    memory = ConversationMemory(summarize=plain_summarize)
+    question = "मेरे पीएम किसान की किस्त कब आएगी? मेरा आधार नंबर 4264 5678 9012 है।"
+    answer = "आपकी पिछली किस्त ₹2000 15-अगस्त को जमा हुई थी। अगली किस्त अगले महीने आने की संभावना है।"
+    for turn in range(1, 41):
+        memory.add_turn(question, answer)
+        if turn in (1, 2, 4, 5, 10, 20, 40):
+            print(f"turn {turn:2d}: ~{memory.prompt_tokens()} prompt tokens, "
+                  f"{len(memory.turns)} verbatim turns, {memory.folds} folds")
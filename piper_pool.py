@@ -0,0 +1,379 @@
+import os
+import re
+import json
+import time
+import queue
+import threading
+import subprocess
+
+
+PIPER_DIR = os.path.join(os.getcwd(), 'piper')
+PIPER_EXECUTABLE = os.path.join(PIPER_DIR, 'piper.exe')
+BYTES_PER_SAMPLE = 2
+CHUNK_BYTES = 1024 * BYTES_PER_SAMPLE
+JOB_TIMEOUT = 30.0
+RESTART_BACKOFF = 0.5
+# "piper" drives the bundled piper.exe; "onnx" runs the same voices in-process
+# with ONNX Runtime (tts_onnx.py), which is the only option off Windows.
+TTS_BACKEND = os.environ.get("PRAGATI_TTS", "piper" if os.name == 'nt' else "onnx")
+# Sentences of one voice synthesized at the same time; 0 picks the backend's
+# default (one piper process per voice, or cores / intra-op threads for onnx).
+TTS_PARALLEL = int(os.environ.get("PRAGATI_TTS_PARALLEL", "0"))
+
+lang_map = {
+    'en-IN': "en_GB-northern_english_male-medium.onnx",
+    'hi-IN': "hi_IN-pratham-medium.onnx",
+    'ml-IN': "ml_IN-arjun-medium.onnx",
+    'te-IN': "te_IN-maya-medium.onnx"
+}
+
+# piper logs one "Real-time factor: ... (infer=... sec, audio=... sec)" line on
+# stderr after it has flushed all raw audio for an input line. That line is the
+# end-of-utterance frame marker for the stdout byte stream.
+_AUDIO_SECONDS = re.compile(rb'audio=([0-9.eE+-]+)')
+
+
+def read_sample_rate(model_filename, default=22050):
+    config_path = os.path.join(PIPER_DIR, model_filename + '.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return int(json.load(f)['audio']['sample_rate'])
+    except (OSError, KeyError, ValueError):
+        return default
+
+
+def frame_utterance(text):
+    """One utterance per line: piper reads stdin line by line, so embedded newlines are collapsed."""
+    return (' '.join(text.split()) + '\n').encode('utf-8')
+
+
+class PiperJob:
+    def __init__(self, text):
+        self.text = text
+        self.audio_queue = queue.Queue(maxsize=200)
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self.received_bytes = 0
+        self.expected_bytes = None
+        self.submitted_at = None
+        self.first_audio_at = None
+
+    def put(self, chunk):
+        if self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+        while not self.cancelled.is_set():
+            try:
+                self.audio_queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self):
+        if self.done.is_set():
+            return
+        self.done.set()
+        self.put(None)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def time_to_first_audio(self):
+        if self.submitted_at is None or self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.submitted_at
+
+
+class PiperWorker:
+    """
+    A long-lived piper process for one voice. Utterances are written to stdin as
+    framed lines and served one at a time; the raw PCM of the current job is pushed
+    into that job's queue by a reader thread. The process is respawned if it dies.
+    """
+
+    def __init__(self, model_filename):
+        self.model_filename = model_filename
+        self.model_path = os.path.join(PIPER_DIR, model_filename)
+        self.sample_rate = read_sample_rate(model_filename)
+        self.jobs = queue.Queue()
+        self.process = None
+        self.current = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.closing = False
+        self.restarts = 0
+        self.dispatcher = None
+
+    def start(self):
+        if self.dispatcher is not None:
+            return
+        self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, text):
+        job = PiperJob(text)
+        self.jobs.put(job)
+        return job
+
+    def close(self):
+        self.closing = True
+        self.jobs.put(None)
+        self._kill()
+
+    def reset(self):
+        """
+        Drops the utterance in progress. Piper can't be told to stop mid-line, so
+        the process is killed (the stdout reader then finishes the job) and a
+        warm-up job respawns it while the user is talking.
+        """
+        with self.lock:
+            job = self.current
+        if job is None:
+            return False
+        job.cancel()
+        self._kill()
+        self.submit(".")
+        return True
+
+    def _spawn(self):
+        if not os.path.exists(PIPER_EXECUTABLE):
+            print(f"Error: Piper executable not found at {PIPER_EXECUTABLE}")
+            return False
+        if not os.path.exists(self.model_path):
+            print(f"Error: Piper model not found at {self.model_path}")
+            return False
+        proc = subprocess.Popen(
+            [PIPER_EXECUTABLE, "-m", self.model_path, "--output-raw"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        self.process = proc
+        threading.Thread(target=self._stdout_reader, args=(proc,), daemon=True).start()
+        threading.Thread(target=self._stderr_reader, args=(proc,), daemon=True).start()
+        self.ready.set()
+        return True
+
+    def _kill(self):
+        proc = self.process
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.close()
+        except (OSError, BrokenPipeError):
+            pass
+        proc.terminate()
+        try:
+            proc.wait(timeout=0.5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    def _ensure_process(self):
+        while not self.closing:
+            if self.process is not None and self.process.poll() is None:
+                return True
+            self.ready.clear()
+            if self.process is not None:
+                self.restarts += 1
+                print(f"Piper worker for {self.model_filename} exited, restarting ({self.restarts})...")
+                time.sleep(RESTART_BACKOFF)
+            try:
+                if not self._spawn():
+                    return False
+            except OSError as e:
+                print(f"Error starting piper for {self.model_filename}: {e}")
+                return False
+        return False
+
+    def _dispatch_loop(self):
+        while not self.closing:
+            job = self.jobs.get()
+            if job is None:
+                break
+            if job.cancelled.is_set() or not job.text.strip():
+                job.finish()
+                continue
+            if not self._ensure_process():
+                job.finish()
+                continue
+            with self.lock:
+                self.current = job
+            job.submitted_at = time.perf_counter()
+            try:
+                self.process.stdin.write(frame_utterance(job.text))
+            except (OSError, BrokenPipeError):
+                self._finish_current(job)
+                continue
+            if not job.done.wait(JOB_TIMEOUT):
+                print(f"Piper worker for {self.model_filename} stalled, restarting...")
+                self._kill()
+                self._finish_current(job)
+
+    def _finish_current(self, job):
+        with self.lock:
+            if self.current is job:
+                self.current = None
+        job.finish()
+
+    def _maybe_finish(self, job):
+        with self.lock:
+            if job is not self.current or job.expected_bytes is None:
+                return
+            if job.received_bytes < job.expected_bytes:
+                return
+            self.current = None
+        job.finish()
+
+    def _stdout_reader(self, proc):
+        try:
+            while True:
+                chunk = proc.stdout.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                with self.lock:
+                    job = self.current
+                    if job is not None:
+                        job.received_bytes += len(chunk)
+                if job is None:
+                    continue
+                job.put(chunk)
+                self._maybe_finish(job)
+        except (OSError, ValueError):
+            pass
+        finally:
+            # The process died mid-utterance: release whoever is waiting on it.
+            with self.lock:
+                job = self.current if self.process is proc else None
+            if job is not None:
+                self._finish_current(job)
+
+    def _stderr_reader(self, proc):
+        try:
+            for line in iter(proc.stderr.readline, b''):
+                match = _AUDIO_SECONDS.search(line)
+                if not match:
+                    continue
+                with self.lock:
+                    job = self.current
+                    if job is not None:
+                        samples = round(float(match.group(1)) * self.sample_rate)
+                        job.expected_bytes = samples * BYTES_PER_SAMPLE
+                if job is not None:
+                    self._maybe_finish(job)
+        except (OSError, ValueError):
+            pass
+
+
+def worker_load(worker):
+    return worker.jobs.qsize() + (worker.current is not None)
+
+
+class PiperPool:
+    """
+    Keeps `parallel` Piper processes running for each voice. Every submitted
+    sentence goes to the least busy process of its voice, so a feeder with
+    several sentences in flight keeps all of them rendering at once. Voices
+    not loaded up front get their processes on first use.
+    """
+
+    def __init__(self, models=None, parallel=None):
+        self.parallel = parallel or TTS_PARALLEL or 1
+        self.workers = {name: [PiperWorker(name) for _ in range(self.parallel)]
+                        for name in (models or lang_map.values())}
+
+    def start(self, warm_up=True):
+        for replicas in self.workers.values():
+            for worker in replicas:
+                worker.start()
+                if warm_up:
+                    worker.submit(".")
+
+    def submit(self, model_filename, text):
+        replicas = self.workers.get(model_filename)
+        if replicas is None:
+            replicas = self.workers[model_filename] = [PiperWorker(model_filename) for _ in range(self.parallel)]
+            for worker in replicas:
+                worker.start()
+        return min(replicas, key=worker_load).submit(text)
+
+    def reset(self, model_filename):
+        return any([worker.reset() for worker in self.workers.get(model_filename, ())])
+
+    def close(self):
+        for replicas in self.workers.values():
+            for worker in replicas:
+                worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def make_pool(backend=None):
+    if (backend or TTS_BACKEND) == "onnx":
+        from tts_onnx import OnnxPool
+        return OnnxPool()
+    return PiperPool()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = make_pool()
+            _pool.start(warm_up=False)
+        return _pool
+
+
+def start_pool():
+    """Spawns and warms all voices in the background so the first reply doesn't pay the model load."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = make_pool()
+    threading.Thread(target=_pool.start, daemon=True).start()
+    return _pool
+
+
+def cold_time_to_first_audio(model_filename, text):
+    model_path = os.path.join(PIPER_DIR, model_filename)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [PIPER_EXECUTABLE, "-m", model_path, "--output-raw"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        bufsize=0
+    )
+    try:
+        proc.stdin.write(text.encode('utf-8'))
+        proc.stdin.close()
+        proc.stdout.read(CHUNK_BYTES)
+        return time.perf_counter() - start
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def warm_time_to_first_audio(pool, model_filename, text):
+    job = pool.submit(model_filename, text)
+    job.audio_queue.get()
+    ttfa = job.time_to_first_audio()
+    job.cancel()
+    job.done.wait(JOB_TIMEOUT)
+    return ttfa
+
+
+def report_time_to_first_audio(text="Hello! How can I help you today?", runs=3):
+    pool = PiperPool()
+    pool.start()
+    for model_filename in lang_map.values():
+        pool.workers[model_filename][0].ready.wait(JOB_TIMEOUT)
+        cold = min(cold_time_to_first_audio(model_filename, text) for _ in range(runs))
+        warm = min(warm_time_to_first_audio(pool, model_filename, text) or float('nan') for _ in range(runs))
+        print(f"{model_filename:45s} cold: {cold * 1000:8.1f} ms   warm: {warm * 1000:8.1f} ms")
+    pool.close()
+
+
+if __name__ == "__main__":
+    report_time_to_first_audio()
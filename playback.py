@@ -0,0 +1,341 @@
+import collections
+import queue
+import threading
+import time
+
+import numpy as np
+
+import piper_pool
+from resample import StreamingResampler
+from ring_buffer import PcmRingBuffer
+from speech_stream import TtsChunkFeeder
+
+
+BUFFER_SECONDS = 4
+LEAD_IN_MS = 40       # real silence ahead of an utterance that starts from idle
+BLOCK_FRAMES = 512    # ~11 ms at 48 kHz: how quickly a flush becomes audible
+FLUSH_TIMEOUT = 0.25
+
+
+def device_rate(device=None):
+    import sounddevice as sd
+    try:
+        return int(sd.query_devices(device, 'output')['default_samplerate'])
+    except Exception:
+        return 48000
+
+
+class ResamplingSink:
+    """
+    Stands in for a PcmRingBuffer on the producer side of a TtsChunkFeeder:
+    converts one voice's PCM to the engine rate and writes it into the shared
+    ring. close() flushes the filter tail instead of ending the stream.
+    """
+
+    def __init__(self, ring, src_rate, dst_rate, on_first_write=None):
+        self.ring = ring
+        self.resampler = StreamingResampler(src_rate, dst_rate) if src_rate != dst_rate else None
+        self.on_first_write = on_first_write
+        self._odd_byte = b''
+
+    def write(self, samples, stop_event=None):
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1)
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        if len(samples) == 0:
+            return 0
+        if self.on_first_write is not None:
+            self.on_first_write()
+            self.on_first_write = None
+        return self.ring.write(samples, stop_event)
+
+    def write_bytes(self, chunk, stop_event=None):
+        if self._odd_byte:
+            chunk = self._odd_byte + chunk
+        usable = len(chunk) - len(chunk) % 2
+        self._odd_byte = chunk[usable:]
+        return self.write(np.frombuffer(chunk, dtype=np.int16, count=usable // 2), stop_event)
+
+    def close(self):
+        if self.resampler is not None:
+            tail = self.resampler.process(np.zeros(self.resampler.taps, dtype=np.int16))
+            if len(tail):
+                self.ring.write(tail)
+
+
+class Utterance:
+    """
+    One queued piece of speech: text chunks for a Piper voice, or ready PCM.
+    started is set when its first sample reaches the device callback, done
+    when its last one has played or it was cancelled.
+    """
+
+    def __init__(self, chunks=None, model_filename=None, cache=None, samples=None, sample_rate=None):
+        self.chunks = chunks
+        self.model_filename = model_filename
+        self.cache = cache
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.feeder = None
+        self.start_frame = None
+        self.end_frame = None
+        self.queued_at = time.perf_counter()
+        self.first_pcm_at = None
+        self.frames_ahead = 0
+        self.first_audio_at = None
+        self.gap_frames = 0
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+        feeder = self.feeder
+        if feeder is not None:
+            feeder.stop()
+
+    def wait_started(self):
+        """Returns False if the utterance ended (or was cancelled) without making a sound."""
+        while not self.started.wait(0.05):
+            if self.done.is_set():
+                return self.started.is_set()
+        return True
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def time_to_first_audio(self):
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.queued_at
+
+
+class PlaybackEngine:
+    """
+    One output stream for the whole session, opened once and kept running.
+    Utterances are played strictly in the order they were queued: a single
+    producer thread synthesizes each into a shared ring at the device rate,
+    resampling per voice, and the next one is appended right behind the
+    previous so replies chain without gaps. When nothing is queued the
+    callback plays silence, so the device never has to restart (and clip)
+    for the next utterance. interrupt() drops everything queued or buffered.
+    """
+
+    def __init__(self, rate=None, device=None, buffer_seconds=BUFFER_SECONDS, block_frames=BLOCK_FRAMES):
+        self.device = device
+        self.rate = rate
+        self.block_frames = block_frames
+        self.buffer_seconds = buffer_seconds
+        self.ring = None
+        self.stream = None
+        self.pending = queue.Queue()
+        self.playing = collections.deque()   # written to the ring, not finished yet
+        self.current = None
+        self.speaking = threading.Event()
+        self.flush_requested = False
+        self.flushed = threading.Event()
+        self.lock = threading.Lock()
+        self.overheads = []
+        self.gap_frames = 0
+        self.underruns = 0
+        self.utterances = 0
+        self.interrupts = 0
+
+    def start(self):
+        # Imported here so the GUI can come up before PortAudio is loaded.
+        import sounddevice as sd
+        with self.lock:
+            if self.stream is not None:
+                return self
+            self.rate = self.rate or device_rate(self.device)
+            self.ring = PcmRingBuffer(self.rate * self.buffer_seconds, 1)
+            self.stream = sd.OutputStream(
+                samplerate=self.rate,
+                channels=1,
+                dtype='int16',
+                device=self.device,
+                blocksize=self.block_frames,
+                callback=self._callback
+            )
+            self.stream.start()
+            threading.Thread(target=self._producer_loop, daemon=True).start()
+        print(f"Playback engine running at {self.rate} Hz, {self.block_frames}-frame blocks")
+        return self
+
+    def close(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.abort()
+            stream.close()
+        self.pending.put(None)
+
+    def speak(self, chunks, model_filename, cache=None):
+        """Queues text chunks for a Piper voice; returns the Utterance."""
+        return self._enqueue(Utterance(chunks, model_filename, cache))
+
+    def play(self, samples, sample_rate):
+        """Queues ready int16 PCM (earcons, tests); returns the Utterance."""
+        return self._enqueue(Utterance(samples=samples, sample_rate=sample_rate))
+
+    def _enqueue(self, utterance):
+        if self.stream is None:
+            self.start()
+        self.pending.put(utterance)
+        return utterance
+
+    def interrupt(self):
+        """
+        Cancels the current and all queued utterances and drops the buffered
+        audio. Returns once the callback has switched to silence.
+        """
+        self.interrupts += 1
+        while True:
+            try:
+                utterance = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if utterance is None:
+                self.pending.put(None)
+                break
+            utterance.cancel()
+            utterance.done.set()
+        current = self.current
+        if current is not None:
+            current.cancel()
+        for utterance in list(self.playing):
+            utterance.cancel()
+        return self._flush()
+
+    def _flush(self, wait=True):
+        self.flushed.clear()
+        self.flush_requested = True
+        if wait and self.stream is not None:
+            return self.flushed.wait(FLUSH_TIMEOUT)
+        return True
+
+    def _producer_loop(self):
+        while True:
+            utterance = self.pending.get()
+            if utterance is None:
+                break
+            if utterance.cancelled.is_set():
+                utterance.done.set()
+                continue
+            self.current = utterance
+            if self.ring.fill_level() == 0:
+                self.ring.write(np.zeros(self.rate * LEAD_IN_MS // 1000, dtype=np.int16))
+            utterance.start_frame = self.ring.write_index
+            self.playing.append(utterance)
+            try:
+                self._render(utterance)
+            except Exception as e:
+                print(f"Playback error: {e}")
+            finally:
+                utterance.end_frame = self.ring.write_index
+                self.current = None
+                if utterance.cancelled.is_set():
+                    # Drop whatever was written between interrupt() and the feeder stopping.
+                    self._flush(wait=False)
+            self.utterances += 1
+
+    def _render(self, utterance):
+        def first_write():
+            utterance.first_pcm_at = time.perf_counter()
+            utterance.frames_ahead = self.ring.fill_level()
+
+        if utterance.samples is not None:
+            sink = ResamplingSink(self.ring, utterance.sample_rate, self.rate, first_write)
+            sink.write(utterance.samples, utterance.cancelled)
+            sink.close()
+            return
+        sink = ResamplingSink(self.ring, piper_pool.read_sample_rate(utterance.model_filename), self.rate, first_write)
+        feeder = TtsChunkFeeder(piper_pool.get_pool(), utterance.model_filename, utterance.chunks, sink, utterance.cache)
+        utterance.feeder = feeder
+        if utterance.cancelled.is_set():
+            feeder.stop()
+        feeder.start()
+        feeder.finished.wait()
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status:
+            print(f"Sounddevice callback status: {status}", flush=True)
+        if self.flush_requested:
+            self.flush_requested = False
+            self.ring.read_index = self.ring.write_index
+            self.ring.space_available.set()
+            self.flushed.set()
+        n = self.ring.read_into(outdata)
+        position = self.ring.read_index
+        now = time.perf_counter()
+        while self.playing:
+            utterance = self.playing[0]
+            cancelled = utterance.cancelled.is_set()
+            if not cancelled and not utterance.started.is_set() and position > utterance.start_frame:
+                utterance.first_audio_at = now
+                utterance.started.set()
+                self.speaking.set()
+                if utterance.first_pcm_at is not None:
+                    lead = utterance.frames_ahead / self.rate
+                    self.overheads.append(max(now - utterance.first_pcm_at - lead, 0.0))
+            if utterance.end_frame is None or position < utterance.end_frame:
+                if not cancelled and utterance.started.is_set() and n < frames:
+                    utterance.gap_frames += frames - n
+                    self.gap_frames += frames - n
+                    self.underruns += 1
+                break
+            self.playing.popleft()
+            utterance.done.set()
+        if not self.playing and self.current is None and self.pending.empty():
+            self.speaking.clear()
+
+    def stats(self):
+        ordered = sorted(self.overheads)
+        ring = self.ring.stats() if self.ring is not None else None
+        if ring is not None:
+            # The ring is never closed, so it also counts idle silence as underruns;
+            # only the callback knows when an utterance was actually starved.
+            del ring['underruns']
+        return {
+            'rate': self.rate,
+            'utterances': self.utterances,
+            'interrupts': self.interrupts,
+            'overhead_ms_p50': round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+            'overhead_ms_max': round(ordered[-1] * 1000, 1) if ordered else None,
+            'underruns': self.underruns,
+            'gap_frames': self.gap_frames,
+            'gap_ms': round(self.gap_frames / self.rate * 1000, 1) if self.rate else 0.0,
+            'ring': ring,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = PlaybackEngine()
+        return _engine
+
+
+def tone(freq, seconds, rate):
+    t = np.arange(int(seconds * rate)) / rate
+    return (np.sin(2 * np.pi * freq * t) * 0.2 * 32767).astype(np.int16)
+
+
+if __name__ == "__main__":
+    engine = get_engine().start()
+    # Three back-to-back utterances at voice rates other than the device's.
+    utterances = [engine.play(tone(f, 0.4, r), r) for f, r in ((440, 22050), (550, 16000), (660, 22050))]
+    for u in utterances:
+        u.wait()
+        print(f"{u.sample_rate} Hz utterance: audible {u.time_to_first_audio() * 1000:.1f} ms after queueing, "
+              f"gaps {u.gap_frames / engine.rate * 1000:.1f} ms")
+    time.sleep(0.5)
+    u = engine.play(tone(440, 0.3, 22050), 22050)
+    u.wait()
+    print("After idle:", f"{u.time_to_first_audio() * 1000:.1f} ms to audible")
+    print(engine.stats())
+    engine.close()
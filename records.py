@@ -0,0 +1,190 @@
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pragati.db")
+CACHE_SIZE = 4096
+
+# latest_credit and credits are created by dbt_ingest.py; until a payment file
+# has been loaded only the customers table exists.
+LOOKUP_SQL = """
+SELECT c.name, c.scheme, c.last_credit, l.credit_date, l.amount
+FROM customers c LEFT JOIN latest_credit l ON l.user_id = c.user_id
+WHERE c.user_id = ?
+"""
+
+CUSTOMER_SQL = """
+SELECT name, scheme, last_credit, NULL, NULL FROM customers WHERE user_id = ?
+"""
+
+HAS_LEDGER_SQL = "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ('credits', 'latest_credit')"
+
+# Served by idx_credits_reference (user_id, credit_date, reference), read backwards.
+LAST_CREDITS_SQL = """
+SELECT credit_date, amount, scheme FROM credits
+WHERE user_id = ? ORDER BY credit_date DESC LIMIT ?
+"""
+
+
+def format_credit(credit_date, amount):
+    day = credit_date
+    try:
+        day = time.strftime("%d-%b", time.strptime(credit_date, "%Y-%m-%d"))
+    except ValueError:
+        pass
+    return f"₹{amount} on {day}"
+
+
+class RecordStore:
+    """
+    Read-only access to the customers table and the payment ledger, if one
+    has been loaded. The database is opened with mode=ro and never written;
+    schema changes belong to dbt_ingest.py. Every thread gets its own
+    connection (sqlite3 connections must not be shared), statements come from
+    the connection's statement cache, and hot records sit in a bounded LRU that
+    is dropped whenever PRAGMA data_version reports a commit from elsewhere.
+    """
+
+    def __init__(self, path=DB_PATH, cache_size=CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                                   cached_statements=64)
+            conn.execute("PRAGMA query_only = ON")
+            self.local.conn = conn
+            self.local.data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            self.local.has_ledger = self._has_ledger(conn)
+        return conn
+
+    def _has_ledger(self, conn):
+        return conn.execute(HAS_LEDGER_SQL).fetchone()[0] == 2
+
+    def _check_version(self, conn):
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.local.data_version:
+            self.local.data_version = version
+            self.local.has_ledger = self._has_ledger(conn)
+            self.invalidate()
+
+    def invalidate(self):
+        with self.cache_lock:
+            self.cache.clear()
+
+    def get(self, user_id):
+        conn = self._connection()
+        self._check_version(conn)
+        with self.cache_lock:
+            if user_id in self.cache:
+                self.cache.move_to_end(user_id)
+                self.hits += 1
+                return self.cache[user_id]
+        row = conn.execute(LOOKUP_SQL if self.local.has_ledger else CUSTOMER_SQL, (user_id,)).fetchone()
+        record = None
+        if row is not None:
+            last_credit = row[2] if row[4] is None else format_credit(row[3], row[4])
+            record = {"name": row[0], "scheme": row[1], "last_credit": last_credit}
+        with self.cache_lock:
+            self.misses += 1
+            # Misses are cached too: repeated wrong numbers shouldn't hit the disk.
+            self.cache[user_id] = record
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return record
+
+    def last_credits(self, user_id, n=3):
+        conn = self._connection()
+        self._check_version(conn)
+        if not self.local.has_ledger:
+            return []
+        return [
+            {"credit_date": d, "amount": a, "scheme": s, "text": format_credit(d, a)}
+            for d, a, s in conn.execute(LAST_CREDITS_SQL, (user_id, n))
+        ]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'cached': len(self.cache),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RecordStore()
+        return _store
+
+
+def build_benchmark_db(path, n_records, batch=100_000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("""CREATE TABLE IF NOT EXISTS customers (
+        user_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        scheme TEXT,
+        last_credit TEXT,
+        auth_secret TEXT
+    )""")
+    for start in range(0, n_records, batch):
+        rows = ((f"{200000000000 + i}", f"user{i}", "NREGA", "₹2500 on 15-Aug", None)
+                for i in range(start, min(start + batch, n_records)))
+        conn.executemany("INSERT OR IGNORE INTO customers VALUES (?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    conn.close()
+
+
+def benchmark(n_records=1_000_000, lookups=20_000, threads=8, hot_fraction=0.8, path="bench_records.db"):
+    import random
+    if not os.path.exists(path):
+        print(f"Building {n_records} records in {path}...")
+        build_benchmark_db(path, n_records)
+    store = RecordStore(path)
+    hot = [f"{200000000000 + random.randrange(n_records)}" for _ in range(1000)]
+    latencies = [[] for _ in range(threads)]
+
+    def worker(out):
+        rng = random.Random()
+        for _ in range(lookups // threads):
+            if rng.random() < hot_fraction:
+                key = rng.choice(hot)
+            else:
+                key = f"{200000000000 + rng.randrange(n_records)}"
+            t0 = time.perf_counter()
+            store.get(key)
+            out.append(time.perf_counter() - t0)
+
+    pool = [threading.Thread(target=worker, args=(out,)) for out in latencies]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    values = sorted(v for out in latencies for v in out)
+    print(f"{len(values)} lookups over {threads} threads, {n_records} records")
+    for q in (0.5, 0.95, 0.99):
+        print(f"  p{int(q * 100)}: {values[int(q * (len(values) - 1))] * 1e6:8.1f} us")
+    print(f"  cache: {store.stats()}")
+
+
+if __name__ == "__main__":
+    benchmark()
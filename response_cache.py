@@ -0,0 +1,187 @@
+import collections
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from lexical import tokenize
+
+
+CACHE_PATH = os.path.join("embeddings", "response_cache.json")
+MAX_ENTRIES = 512
+TTL_SECONDS = 24 * 3600
+SIMILARITY_THRESHOLD = 0.85
+# When the LLM has failed, a slightly looser match beats an apology, but only
+# if the cached question covered every term of this one.
+FALLBACK_THRESHOLD = 0.8
+MIN_TOKENS = 2
+
+# Bag-of-words cosine can't see negation ("am I not eligible" vs "am I
+# eligible" scores 0.89), so a hit also needs both questions to agree on it.
+# Malayalam and Telugu negate with a suffix, hence the substring matches.
+ENGLISH_NEGATION = re.compile(r"\b(?:not|no|never|nothing|cannot)\b|n['’]t\b")
+INDIC_NEGATIONS = ('नहीं', 'नही', 'ഇല്ല', 'ില്ല', 'അല്ല', 'కాదు', 'లేదు', 'వద్దు')
+
+
+def scope_key(language, context, schemes):
+    """
+    Answers are only shared between turns with the same language, the same
+    user record text and the same retrieved schemes, so an updated record or
+    schemes.txt edit never serves a stale answer.
+    """
+    digest = hashlib.sha1(f"{context}\0{schemes}".encode("utf-8")).hexdigest()[:16]
+    return f"{language}:{digest}"
+
+
+def query_vector(message):
+    counts = collections.Counter(tokenize(message))
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return {t: v / norm for t, v in counts.items()} if norm else {}
+
+
+def is_negated(message):
+    lowered = message.lower()
+    return bool(ENGLISH_NEGATION.search(lowered)) or any(word in lowered for word in INDIC_NEGATIONS)
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(t, 0.0) for t, v in a.items())
+
+
+class ResponseCache:
+    """
+    LRU of answers keyed by scope, matched by cosine similarity of the
+    normalized query terms (the same tokenizer as the lexical index, so
+    "How to apply for NREGA?" and "how do I apply for nrega" collide).
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, threshold=SIMILARITY_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable response cache {self.path}: {e}")
+            return
+        now = time.time()
+        for entry in saved:
+            if now - entry["created"] < self.ttl:
+                self.entries[(entry["scope"], entry["query"])] = entry
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(self.entries.values()), f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def lookup(self, message, scope, threshold=None, covered=False):
+        """
+        The cached answer closest to message in scope, or None below threshold.
+        With covered, only entries whose query has every term of message count.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        vector = query_vector(message)
+        negated = is_negated(message)
+        now = time.time()
+        best, best_score = None, 0.0
+        with self.lock:
+            if len(vector) >= MIN_TOKENS:
+                for key, entry in list(self.entries.items()):
+                    if now - entry["created"] >= self.ttl:
+                        del self.entries[key]
+                        continue
+                    if entry["scope"] != scope:
+                        continue
+                    if covered and not vector.keys() <= entry["vector"].keys():
+                        continue
+                    if entry.get("negated", False) != negated:
+                        continue
+                    score = cosine(vector, entry["vector"])
+                    if score > best_score:
+                        best, best_score = key, score
+            if best is None or best_score < threshold:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best)
+            entry = self.entries[best]
+            self.hits += 1
+            self.saved_seconds += entry["seconds"]
+            return entry["answer"]
+
+    def fallback_lookup(self, message, scope):
+        return self.lookup(message, scope, threshold=FALLBACK_THRESHOLD, covered=True)
+
+    def store(self, message, scope, answer, seconds):
+        vector = query_vector(message)
+        if len(vector) < MIN_TOKENS or not answer.strip():
+            return
+        with self.lock:
+            key = (scope, " ".join(sorted(vector)))
+            self.entries[key] = {
+                "scope": scope,
+                "query": key[1],
+                "vector": vector,
+                "negated": is_negated(message),
+                "answer": answer,
+                "seconds": seconds,
+                "created": time.time(),
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError as e:
+                print(f"Could not persist response cache: {e}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'saved_seconds': round(self.saved_seconds, 2),
+            'entries': len(self.entries),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+if __name__ == "__main__":
+    cache = ResponseCache(path=None)
+    scope = scope_key("english", "no record", "NREGA Scheme")
+    cache.store("How to apply for NREGA?", scope, "Contact your Gram Panchayat.", 2.4)
+    for q in ("how do I apply for nrega", "How to apply for NREGA", "when does PM-Kisan pay"):
+        print(repr(q), "->", cache.lookup(q, scope))
+    print(cache.stats())
@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+
+EMBEDDINGS_JSON = os.path.join("embeddings", "schemes_embeddings.json")
+INDEX_PREFIX = os.path.join("embeddings", "schemes_index")
+CHUNK_ROWS = 65536
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def quantize(matrix, dtype):
+    """Returns (stored matrix, per-row scales or None) for unit-norm float32 rows."""
+    if dtype == 'float16':
+        return matrix.astype(np.float16), None
+    if dtype == 'int8':
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales
+    raise ValueError(f"Unsupported index dtype: {dtype}")
+
+
+def write_index(prefix, vectors, row_to_scheme, schemes, dtype='float16', source=None):
+    matrix, scales = quantize(_normalize(vectors), dtype)
+    np.save(prefix + ".npy", matrix)
+    if scales is not None:
+        np.save(prefix + ".scales.npy", scales)
+    elif os.path.exists(prefix + ".scales.npy"):
+        os.remove(prefix + ".scales.npy")
+    np.save(prefix + ".rows.npy", np.asarray(row_to_scheme, dtype=np.int32))
+    meta = {
+        "dtype": dtype,
+        "dim": int(matrix.shape[1]),
+        "rows": int(matrix.shape[0]),
+        "schemes": schemes,
+        "source": source,
+    }
+    with open(prefix + ".meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def build_index(json_path=EMBEDDINGS_JSON, prefix=INDEX_PREFIX, dtype='float16'):
+    """
+    Converts the pretty-printed embeddings JSON into the binary index. Both the
+    scheme document vectors and the "Tell me about <scheme>" query vectors are
+    kept as rows; search takes the best row per scheme.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    schemes = data["schemes"]
+    vectors = list(data["scheme_embeddings"])
+    row_to_scheme = list(range(len(schemes)))
+    if data.get("query_embeddings"):
+        vectors += data["query_embeddings"]
+        row_to_scheme += list(range(len(data["query_embeddings"])))
+    st = os.stat(json_path)
+    write_index(prefix, vectors, row_to_scheme, schemes, dtype,
+                source={"path": json_path, "size": st.st_size, "mtime": st.st_mtime})
+    print(f"Built {dtype} index with {len(vectors)} rows for {len(schemes)} schemes at {prefix}.npy")
+
+
+class SchemeIndex:
+    """
+    Memory-mapped, pre-normalized embedding matrix. Loading maps the .npy file
+    without reading it, and search walks it in fixed-size chunks, so resident
+    memory doesn't grow with the number of schemes.
+    """
+
+    def __init__(self, matrix, scales, row_to_scheme, meta):
+        self.matrix = matrix
+        self.scales = scales
+        self.row_to_scheme = row_to_scheme
+        self.meta = meta
+        self.schemes = meta["schemes"]
+
+    @classmethod
+    def load(cls, prefix=INDEX_PREFIX):
+        with open(prefix + ".meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(prefix + ".npy", mmap_mode="r")
+        scales = np.load(prefix + ".scales.npy", mmap_mode="r") if meta["dtype"] == "int8" else None
+        row_to_scheme = np.load(prefix + ".rows.npy", mmap_mode="r")
+        return cls(matrix, scales, row_to_scheme, meta)
+
+    def search(self, queries, k=3):
+        """queries: (B, dim) or (dim,). Returns B lists of (scheme_index, cosine) best first."""
+        q = _normalize(np.atleast_2d(queries))
+        best = np.full((len(self.schemes), len(q)), -np.inf, dtype=np.float32)
+        for start in range(0, self.matrix.shape[0], CHUNK_ROWS):
+            block = np.asarray(self.matrix[start:start + CHUNK_ROWS], dtype=np.float32)
+            scores = block @ q.T
+            if self.scales is not None:
+                scores *= self.scales[start:start + CHUNK_ROWS, None]
+            np.maximum.at(best, self.row_to_scheme[start:start + CHUNK_ROWS], scores)
+        k = min(k, len(self.schemes))
+        results = []
+        for column in best.T:
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top])]
+            results.append([(int(i), float(column[i])) for i in top])
+        return results
+
+
+def index_is_stale(prefix=INDEX_PREFIX, json_path=EMBEDDINGS_JSON):
+    try:
+        with open(prefix + ".meta.json", "r", encoding="utf-8") as f:
+            source = json.load(f).get("source") or {}
+    except (OSError, ValueError):
+        return True
+    if not source or source.get("path") != json_path:
+        return False
+    try:
+        st = os.stat(json_path)
+    except OSError:
+        return False
+    return source.get("size") != st.st_size or source.get("mtime") != st.st_mtime
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            if index_is_stale():
+                build_index()
+            _index = SchemeIndex.load()
+        return _index
+
+
+def top_schemes(query_vector, k=2, min_score=0.2):
+    index = get_index()
+    hits = index.search(query_vector, k)[0]
+    return [index.schemes[i] for i, score in hits if score >= min_score]
+
+
+if __name__ == "__main__":
+    build_index(dtype=sys.argv[1] if len(sys.argv) > 1 else 'float16')
+    index = SchemeIndex.load()
+    with open(EMBEDDINGS_JSON, "r", encoding="utf-8") as f:
+        queries = np.asarray(json.load(f)["query_embeddings"], dtype=np.float32)
+    for row, hits in enumerate(index.search(queries, k=2)):
+        print(row, [(index.schemes[i].split(':')[0], round(s, 3)) for i, s in hits])
@@ -0,0 +1,108 @@
+import threading
+import numpy as np
+
+
+class PcmRingBuffer:
+    """
+    Fixed-capacity int16 ring buffer for one producer thread and one consumer
+    (the sounddevice callback). Each side only advances its own index, so neither
+    takes a lock and the callback never blocks; reads and writes wrap with at most
+    two slice copies.
+    """
+
+    def __init__(self, capacity_frames, channels=1):
+        self.capacity = int(capacity_frames)
+        self.channels = channels
+        self.data = np.zeros((self.capacity, channels), dtype=np.int16)
+        self.write_index = 0
+        self.read_index = 0
+        self.closed = False
+        self._odd_byte = b''
+        self.underruns = 0
+        self.frames_written = 0
+        self.frames_read = 0
+        self.space_available = threading.Event()
+        self.space_available.set()
+
+    def fill_level(self):
+        return self.write_index - self.read_index
+
+    def fill_ratio(self):
+        return self.fill_level() / self.capacity
+
+    def free_space(self):
+        return self.capacity - self.fill_level()
+
+    def close(self):
+        """Marks end of stream; the consumer drains what is left and then stops."""
+        self.closed = True
+
+    def write(self, samples, stop_event=None):
+        """
+        Producer side. Blocks (off the audio thread) while the buffer is full and
+        returns the number of frames written, which is short only if stopped.
+        """
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1, self.channels)
+        written = 0
+        while written < len(samples):
+            free = self.free_space()
+            if free == 0:
+                self.space_available.clear()
+                if self.free_space() == 0:
+                    if stop_event is not None and stop_event.is_set():
+                        break
+                    self.space_available.wait(0.05)
+                continue
+            n = min(free, len(samples) - written)
+            start = self.write_index % self.capacity
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = samples[written:written + first]
+            if n > first:
+                self.data[:n - first] = samples[written + first:written + n]
+            written += n
+            # Publish only after the copy is complete.
+            self.write_index += n
+            self.frames_written += n
+        return written
+
+    def write_bytes(self, chunk, stop_event=None):
+        # Pipe reads can split a sample; carry the odd byte into the next chunk.
+        if self._odd_byte:
+            chunk = self._odd_byte + chunk
+        usable = len(chunk) - len(chunk) % 2
+        self._odd_byte = chunk[usable:]
+        return self.write(np.frombuffer(chunk, dtype=np.int16, count=usable // 2), stop_event)
+
+    def read_into(self, outdata):
+        """
+        Consumer side, safe to call from the audio callback. Fills outdata with
+        what is available, zero-pads the rest and returns the frames copied.
+        """
+        frames = len(outdata)
+        n = min(frames, self.fill_level())
+        start = self.read_index % self.capacity
+        first = min(n, self.capacity - start)
+        outdata[:first] = self.data[start:start + first]
+        if n > first:
+            outdata[first:n] = self.data[:n - first]
+        if n < frames:
+            outdata[n:] = 0
+            if not self.closed:
+                self.underruns += 1
+        self.read_index += n
+        self.frames_read += n
+        self.space_available.set()
+        return n
+
+    def drained(self):
+        return self.closed and self.fill_level() == 0
+
+    def stats(self):
+        return {
+            'capacity_frames': self.capacity,
+            'fill_frames': self.fill_level(),
+            'fill_ratio': round(self.fill_ratio(), 3),
+            'underruns': self.underruns,
+            'frames_written': self.frames_written,
+            'frames_read': self.frames_read,
+        }
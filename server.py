@@ -0,0 +1,411 @@
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import json
+import queue
+import re
+import threading
+import time
+
+import numpy as np
+
+import piper_pool
+import sessions
+from speech_stream import split_speakable
+
+
+HOST = "0.0.0.0"
+PORT = 8765
+MAX_CONCURRENT_TURNS = 32
+EVENT_CREDITS = 64          # events a turn may have in flight before its producers block
+MAX_BODY_BYTES = 8 * 1024 * 1024
+HISTORY_TURNS = 8
+SESSION_ID = re.compile(r'[0-9a-f]{32}')  # as issued by sessions.SessionStore
+
+LANG_CODES = {'english': 'en-IN', 'hindi': 'hi-IN', 'malayalam': 'ml-IN', 'telugu': 'te-IN'}
+
+
+class TurnCancelled(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    """Raised while parsing a request; the message is sent back to the client as is."""
+
+
+class EventChannel:
+    """
+    Carries events from the LLM and TTS worker threads to the coroutine that
+    writes the HTTP response. Producers take a credit per event and the writer
+    returns it once the event is on the socket, so a slow client throttles its
+    own pipeline instead of growing a queue.
+    """
+
+    def __init__(self, loop, credits=EVENT_CREDITS):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.credits = threading.Semaphore(credits)
+        self.cancelled = threading.Event()
+
+    def put(self, event):
+        while not self.credits.acquire(timeout=0.1):
+            if self.cancelled.is_set():
+                raise TurnCancelled()
+        if self.cancelled.is_set():
+            raise TurnCancelled()
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def aput(self, event):
+        # Same credits for producers running on the event loop itself.
+        while not self.credits.acquire(blocking=False):
+            if self.cancelled.is_set():
+                raise TurnCancelled()
+            await asyncio.sleep(0.005)
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def release(self):
+        self.credits.release()
+
+
+class StubChat:
+    """Answers every turn with a canned reply at a configurable token rate."""
+
+    def __init__(self, first_token_delay=0.3, token_delay=0.02):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    async def astream(self, message, language, history, session_id):
+        await asyncio.sleep(self.first_token_delay)
+        reply = "Your NREGA wages of ₹2500 were credited on 15-Aug. Is there anything else I can help with?"
+        for word in reply.split(' '):
+            yield word + ' '
+            await asyncio.sleep(self.token_delay)
+
+
+class CustomChat:
+    def astream(self, message, language, history, session_id):
+        from custom import achat_gen
+        return achat_gen(message, language, history=history, return_buffer=False, session_id=session_id)
+
+
+class StubTts:
+    """Produces silence at the Piper sample rate, paced at a fixed real-time factor."""
+
+    def __init__(self, sample_rate=22050, seconds_per_char=0.06, rtf=0.1):
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+        self.rtf = rtf
+
+    def sample_rate_for(self, lang_code):
+        return self.sample_rate
+
+    def synthesize(self, text, lang_code, cancelled):
+        samples = int(len(text) * self.seconds_per_char * self.sample_rate)
+        step = piper_pool.CHUNK_BYTES // piper_pool.BYTES_PER_SAMPLE
+        for start in range(0, samples, step):
+            if cancelled.is_set():
+                return
+            n = min(step, samples - start)
+            time.sleep(n / self.sample_rate * self.rtf)
+            yield np.zeros(n, dtype=np.int16).tobytes()
+
+
+class PiperTts:
+    def sample_rate_for(self, lang_code):
+        return piper_pool.read_sample_rate(piper_pool.lang_map[lang_code])
+
+    def synthesize(self, text, lang_code, cancelled):
+        job = piper_pool.get_pool().submit(piper_pool.lang_map[lang_code], text)
+        try:
+            while True:
+                chunk = job.audio_queue.get()
+                if chunk is None:
+                    return
+                yield chunk
+                if cancelled.is_set():
+                    return
+        finally:
+            job.cancel()
+
+
+class TurnServer:
+    def __init__(self, chat, tts, stt_client, max_turns=MAX_CONCURRENT_TURNS):
+        self.chat = chat
+        self.tts = tts
+        self.stt_client = stt_client
+        self.turn_slots = asyncio.Semaphore(max_turns)
+        # The LLM stage runs on the event loop; threads are only for TTS and STT.
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2 * max_turns)
+        self.active_turns = 0
+        self.completed_turns = 0
+
+    async def _llm_stage(self, channel, session, message, language, tokens):
+        history = session.history or []
+        answer = []
+        stream = self.chat.astream(message, language, history, session.session_id)
+        try:
+            async for token in stream:
+                answer.append(token)
+                await channel.aput({"type": "token", "text": token})
+                tokens.put(token)
+        finally:
+            tokens.put(None)
+            await stream.aclose()
+        session.history = (history + [[message, "".join(answer)]])[-HISTORY_TURNS:]
+
+    def _tts_stage(self, channel, lang_code, tokens):
+        channel.put({"type": "audio_format", "sample_rate": self.tts.sample_rate_for(lang_code),
+                     "channels": 1, "sample_width": piper_pool.BYTES_PER_SAMPLE})
+        for chunk in split_speakable(iter(tokens.get, None)):
+            for pcm in self.tts.synthesize(chunk, lang_code, channel.cancelled):
+                channel.put({"type": "audio", "pcm": base64.b64encode(pcm).decode('ascii')})
+
+    async def run_turn(self, request, send):
+        loop = asyncio.get_running_loop()
+        language = request.get("language", "english")
+        lang_code = LANG_CODES.get(language, 'en-IN')
+        # Only ids this server handed out are resumed; anything else starts a new session.
+        session = sessions.get_store().get(request.get("session_id"), language, resume_only=True)
+        channel = EventChannel(loop)
+        stats = {"session_id": session.session_id}
+        start = time.perf_counter()
+
+        pipeline = None
+        async with self.turn_slots:
+            self.active_turns += 1
+            try:
+                message = request.get("text")
+                if not message and request.get("audio"):
+                    message = await loop.run_in_executor(self.executor, self._transcribe, request, lang_code)
+                    stats["stt_seconds"] = round(time.perf_counter() - start, 3)
+                    await send({"type": "transcript", "text": message or ""})
+                if not message:
+                    await send({"type": "error", "error": "empty turn"})
+                    return
+
+                tokens = queue.Queue()
+                stages = [
+                    asyncio.ensure_future(self._llm_stage(channel, session, message, language, tokens)),
+                    loop.run_in_executor(self.executor, self._tts_stage, channel, lang_code, tokens),
+                ]
+                pipeline = asyncio.gather(*stages)
+                # Retrieve the TurnCancelled a stage raises after the client has gone.
+                pipeline.add_done_callback(lambda f: f.cancelled() or f.exception())
+                while True:
+                    getter = asyncio.ensure_future(channel.get())
+                    done, _ = await asyncio.wait({getter, pipeline}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter not in done:
+                        getter.cancel()
+                        break
+                    event = getter.result()
+                    if event["type"] == "token":
+                        stats.setdefault("first_token", round(time.perf_counter() - start, 3))
+                    elif event["type"] == "audio":
+                        stats.setdefault("first_audio", round(time.perf_counter() - start, 3))
+                    await send(event)
+                    channel.release()
+                while not channel.queue.empty():
+                    await send(channel.queue.get_nowait())
+                    channel.release()
+                await pipeline
+                stats["total"] = round(time.perf_counter() - start, 3)
+                await send({"type": "done", "stats": stats})
+                self.completed_turns += 1
+            finally:
+                # Client gone or turn failed: unblock and stop both stages.
+                channel.cancelled.set()
+                if pipeline is not None and not pipeline.done():
+                    pipeline.cancel()
+                self.active_turns -= 1
+
+    def _transcribe(self, request, lang_code):
+        from audio_capture import to_audio_data
+        samples = np.frombuffer(base64.b64decode(request["audio"]), dtype=np.int16)
+        return self.stt_client.recognize(to_audio_data(samples, int(request.get("sample_rate", 16000))), lang_code)
+
+    def health(self):
+        return {
+            "active_turns": self.active_turns,
+            "completed_turns": self.completed_turns,
+            "sessions": sessions.get_store().stats(),
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            try:
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            except ValueError:
+                raise BadRequest("malformed request line")
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise BadRequest("invalid Content-Length")
+            if length > MAX_BODY_BYTES:
+                await self._respond(writer, 413, {"error": "request too large"})
+                return
+            body = await reader.readexactly(length) if length else b''
+
+            if method == 'GET' and path == '/health':
+                await self._respond(writer, 200, self.health())
+            elif method == 'POST' and path == '/turn':
+                await self._stream_turn(writer, parse_turn(body))
+            else:
+                await self._respond(writer, 404, {"error": f"no route for {method} {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except BadRequest as e:
+            await self._respond(writer, 400, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+
+    async def _stream_turn(self, writer, request):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+        async def send(event):
+            line = json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n'
+            writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+            await writer.drain()
+
+        try:
+            await self.run_turn(request, send)
+        except (TurnCancelled, ConnectionError):
+            return
+        except Exception as e:
+            print(f"Turn failed: {e!r}")
+            await send({"type": "error", "error": str(e)})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def parse_turn(body):
+    try:
+        request = json.loads(body or b'{}')
+    except ValueError:
+        raise BadRequest("body is not valid JSON")
+    if not isinstance(request, dict):
+        raise BadRequest("body must be a JSON object")
+    session_id = request.get("session_id")
+    if session_id is not None and not (isinstance(session_id, str) and SESSION_ID.fullmatch(session_id)):
+        raise BadRequest("session_id must be one returned by this server, or omitted")
+    for field in ("text", "audio", "language"):
+        if request.get(field) is not None and not isinstance(request[field], str):
+            raise BadRequest(f"{field} must be a string")
+    if not isinstance(request.get("sample_rate", 16000), int):
+        raise BadRequest("sample_rate must be an integer")
+    return request
+
+
+def make_server(stub=False, **stub_options):
+    from stt_backends import make_stt_client, TranscriptMapBackend, SttClient
+    if stub:
+        stt = SttClient(TranscriptMapBackend(defaults={code: "has my money arrived" for code in LANG_CODES.values()},
+                                             delay=stub_options.get('stt_delay', 0.05)))
+        return TurnServer(StubChat(), StubTts(), stt)
+    return TurnServer(CustomChat(), PiperTts(), make_stt_client())
+
+
+async def serve(host=HOST, port=PORT, stub=False):
+    turn_server = make_server(stub)
+    server = await asyncio.start_server(turn_server.handle_connection, host, port)
+    print(f"Serving turns on http://{host}:{port}/turn ({'stub' if stub else 'live'} backends)")
+    async with server:
+        await server.serve_forever()
+
+
+async def read_turn(host, port, request):
+    """Minimal client: posts one turn and yields the decoded events as they arrive."""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(request).encode('utf-8')
+    writer.write(f"POST /turn HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    try:
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        pending = b''
+        while True:
+            size = int((await reader.readline()).strip() or b'0', 16)
+            if size == 0:
+                break
+            pending += await reader.readexactly(size + 2)
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                line = line.strip(b'\r')
+                if line:
+                    yield json.loads(line)
+    finally:
+        writer.close()
+
+
+async def load_test(clients=50, turns=3, host="127.0.0.1", port=PORT):
+    turn_server = make_server(stub=True)
+    server = await asyncio.start_server(turn_server.handle_connection, host, port)
+    results = []
+
+    async def client(i):
+        session_id = None
+        for turn in range(turns):
+            request = {"session_id": session_id, "language": "hindi"}
+            if turn == 0:
+                request.update(audio=base64.b64encode(np.zeros(16000, dtype=np.int16).tobytes()).decode('ascii'),
+                               sample_rate=16000)
+            else:
+                request["text"] = "What about PM-Kisan?"
+            audio_bytes = 0
+            async for event in read_turn(host, port, request):
+                if event["type"] == "audio":
+                    audio_bytes += len(base64.b64decode(event["pcm"]))
+                elif event["type"] == "done":
+                    session_id = event["stats"]["session_id"]
+                    results.append(dict(event["stats"], audio_bytes=audio_bytes))
+
+    start = time.perf_counter()
+    async with server:
+        await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} turns from {clients} clients in {elapsed:.1f}s ({len(results) / elapsed:.1f} turns/s)")
+    for key in ("first_token", "first_audio", "total"):
+        values = sorted(r[key] for r in results if key in r)
+        if values:
+            print(f"  {key:12s} p50 {values[len(values) // 2]:.3f}s  p95 {values[int(0.95 * (len(values) - 1))]:.3f}s")
+    print(f"  {turn_server.health()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless PRAGATI turn server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--stub", action="store_true", help="canned LLM, silent TTS and fixed STT")
+    parser.add_argument("--load-test", type=int, metavar="CLIENTS", help="run stubbed clients against a local server")
+    parser.add_argument("--turns", type=int, default=3)
+    args = parser.parse_args()
+    if args.load_test:
+        asyncio.run(load_test(args.load_test, args.turns, port=args.port))
+    else:
+        if not args.stub:
+            piper_pool.start_pool()
+        asyncio.run(serve(args.host, args.port, args.stub))
@@ -0,0 +1,177 @@
+import collections
+import threading
+import time
+import uuid
+
+
+MAX_SESSIONS = 10_000
+IDLE_TIMEOUT = 30 * 60
+DEFAULT_SESSION = "default"
+
+KNOWLEDGE_FIELDS = ('user_id', 'authentication_status', 'discussion_summary', 'open_problems', 'current_goals')
+
+
+class Session:
+    """
+    What survives between turns of one conversation. Slots instead of a dict
+    or a pydantic KnowledgeBase keep an idle session to a few hundred bytes;
+    the KnowledgeBase for the prompt is rebuilt from these fields each turn.
+    """
+
+    __slots__ = ('session_id', 'language', 'user_id', 'authentication_status', 'discussion_summary',
+                 'open_problems', 'current_goals', 'created', 'last_active', 'turns', 'history', 'memory')
+
+    def __init__(self, session_id, language=None):
+        self.session_id = session_id
+        self.language = language
+        self.user_id = 'unknown'
+        self.authentication_status = None
+        self.discussion_summary = ""
+        self.open_problems = ""
+        self.current_goals = ""
+        self.created = self.last_active = time.monotonic()
+        self.turns = 0
+        # [user, agent] pairs, only kept for clients that don't send their own (server.py).
+        self.history = None
+        # ConversationMemory, created on the first turn that needs one (custom.start_turn).
+        self.memory = None
+
+    def knowledge(self):
+        return {field: getattr(self, field) for field in KNOWLEDGE_FIELDS}
+
+    def update_knowledge(self, **fields):
+        for field, value in fields.items():
+            if field in KNOWLEDGE_FIELDS:
+                setattr(self, field, value)
+
+
+class SessionStore:
+    """
+    Thread-safe map of session id -> Session with LRU order. Sessions idle for
+    longer than idle_timeout are dropped, and the least recently used one goes
+    when max_sessions is reached. The lock is never held across a blocking
+    call, so coroutines on an event loop can use it directly.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_timeout=IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def get(self, session_id=None, language=None, resume_only=False):
+        """
+        Returns the live session, creating it (with a fresh id if none is given).
+        With resume_only, an id the store does not hold - never issued, or
+        expired - also gets a fresh one, so clients can't pick their own.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if session_id is None:
+                session_id = uuid.uuid4().hex
+            session = self.sessions.get(session_id)
+            if session is not None and now - session.last_active > self.idle_timeout:
+                del self.sessions[session_id]
+                self.evicted_idle += 1
+                session = None
+            if session is None:
+                if resume_only:
+                    session_id = uuid.uuid4().hex
+                self._make_room(now)
+                session = Session(session_id, language)
+                self.sessions[session_id] = session
+            else:
+                self.sessions.move_to_end(session_id)
+                if language:
+                    session.language = language
+            session.last_active = now
+            return session
+
+    def peek(self, session_id):
+        with self.lock:
+            return self.sessions.get(session_id)
+
+    def end(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None)
+
+    def _make_room(self, now):
+        # Oldest first, so idle sessions are all at the front.
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if now - oldest.last_active > self.idle_timeout:
+                self.sessions.popitem(last=False)
+                self.evicted_idle += 1
+            elif len(self.sessions) >= self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted_lru += 1
+            else:
+                break
+
+    def sweep(self):
+        with self.lock:
+            self._make_room(time.monotonic())
+            return len(self.sessions)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'live': len(self.sessions),
+                'evicted_idle': self.evicted_idle,
+                'evicted_lru': self.evicted_lru,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
+
+
+def benchmark(n_sessions=5000, lookups=100_000, threads=8):
+    import random
+    import tracemalloc
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    store = SessionStore(max_sessions=n_sessions)
+    ids = [uuid.uuid4().hex for _ in range(n_sessions)]
+    for i, session_id in enumerate(ids):
+        store.get(session_id, 'hindi').update_knowledge(user_id=f"{200000000000 + i}",
+                                                        discussion_summary="Asked about NREGA wages.")
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    print(f"{n_sessions} live sessions: {used / 1024:.0f} KiB ({used / n_sessions:.0f} bytes/session)")
+
+    latencies = [[] for _ in range(threads)]
+
+    def worker(out):
+        rng = random.Random()
+        for _ in range(lookups // threads):
+            session_id = rng.choice(ids) if rng.random() < 0.95 else None
+            t0 = time.perf_counter()
+            store.get(session_id, 'hindi')
+            out.append(time.perf_counter() - t0)
+
+    pool = [threading.Thread(target=worker, args=(out,)) for out in latencies]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    values = sorted(v for out in latencies for v in out)
+    print(f"{len(values)} lookups over {threads} threads")
+    for q in (0.5, 0.95, 0.99):
+        print(f"  p{int(q * 100)}: {values[int(q * (len(values) - 1))] * 1e6:6.1f} us")
+    print(f"  {store.stats()}")
+
+
+if __name__ == "__main__":
+    benchmark()
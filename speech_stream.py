@@ -0,0 +1,173 @@
+import threading
+import queue
+import time
+
+import numpy as np
+
+
+# Devanagari danda / double danda are also used in Malayalam and Telugu text, and
+# LLMs frequently emit an ASCII '|' in their place.
+HARD_BREAKS = '!?।॥|\n'
+# '.' only ends a sentence when followed by whitespace, so "₹2500.50" stays whole.
+SOFT_SENTENCE_BREAK = '.'
+CLAUSE_BREAKS = ',;:'
+
+MIN_CLAUSE_CHARS = 40
+MAX_CHUNK_CHARS = 220
+CACHED_SLICE_FRAMES = 4096
+MAX_IN_FLIGHT = 4   # sentences submitted to the pool but not yet written to the ring
+
+
+def _find_cut(buffer, start, min_clause_chars, max_chunk_chars):
+    for i in range(start, len(buffer)):
+        ch = buffer[i]
+        if ch in HARD_BREAKS:
+            return i + 1
+        if i + 1 >= len(buffer):
+            break
+        followed_by_space = buffer[i + 1].isspace()
+        if ch == SOFT_SENTENCE_BREAK and followed_by_space:
+            return i + 1
+        if ch in CLAUSE_BREAKS and followed_by_space and i + 1 >= min_clause_chars:
+            return i + 1
+    if len(buffer) >= max_chunk_chars:
+        space = buffer.rfind(' ', 0, max_chunk_chars)
+        return space + 1 if space > 0 else max_chunk_chars
+    return None
+
+
+def split_speakable(tokens, min_clause_chars=MIN_CLAUSE_CHARS, max_chunk_chars=MAX_CHUNK_CHARS):
+    """
+    Regroups an LLM token stream into speakable chunks, yielding each sentence
+    (or long clause) as soon as its boundary arrives instead of at end of stream.
+    """
+    buffer = ""
+    scanned = 0
+    for token in tokens:
+        buffer += token
+        while True:
+            cut = _find_cut(buffer, scanned, min_clause_chars, max_chunk_chars)
+            if cut is None:
+                # The last char may still turn into a boundary once the next token arrives.
+                scanned = max(len(buffer) - 1, 0)
+                break
+            chunk, buffer, scanned = buffer[:cut].strip(), buffer[cut:], 0
+            if any(c.isalnum() for c in chunk):
+                yield chunk
+    tail = buffer.strip()
+    if any(c.isalnum() for c in tail):
+        yield tail
+
+
+class TtsChunkFeeder:
+    """
+    Submits text chunks to the Piper pool as they arrive and writes each job's
+    PCM, strictly in submission order, into one ring buffer for a single output stream.
+    With a TtsCache, cached chunks are played from their memory map and newly
+    synthesized ones are stored.
+
+    At most max_in_flight chunks are outstanding at once, so a pool with
+    several workers per voice renders sentences 2..K while sentence 1 plays,
+    and a full ring stops new submissions instead of piling up PCM.
+    """
+
+    def __init__(self, pool, model_filename, chunks, ring, cache=None, max_in_flight=MAX_IN_FLIGHT):
+        self.pool = pool
+        self.cache = cache
+        self.model_filename = model_filename
+        self.chunks = chunks
+        self.ring = ring
+        self.jobs = queue.Queue()
+        self.in_flight = threading.Semaphore(max_in_flight)
+        self.first_audio = threading.Event()
+        self.finished = threading.Event()
+        self.stopped = threading.Event()
+        self.started_at = time.perf_counter()
+        self.first_audio_at = None
+        self.text = []
+
+    def start(self):
+        threading.Thread(target=self._submit_loop, daemon=True).start()
+        threading.Thread(target=self._forward_loop, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def wait_for_audio(self):
+        while not self.first_audio.wait(0.05):
+            if self.finished.is_set():
+                return self.first_audio.is_set()
+        return True
+
+    def _submit_loop(self):
+        try:
+            for chunk in self.chunks:
+                while not self.in_flight.acquire(timeout=0.05):
+                    if self.stopped.is_set():
+                        break
+                if self.stopped.is_set():
+                    break
+                self.text.append(chunk)
+                cached = self.cache.get(self.model_filename, chunk) if self.cache is not None else None
+                if cached is not None:
+                    self.jobs.put(cached)
+                else:
+                    self.jobs.put(self.pool.submit(self.model_filename, chunk))
+        except Exception as e:
+            print(f"Error while streaming text to TTS: {e}")
+        finally:
+            self.jobs.put(None)
+
+    def _forward_loop(self):
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                try:
+                    self._forward(job)
+                finally:
+                    self.in_flight.release()
+        finally:
+            self.ring.close()
+            self.finished.set()
+
+    def _forward(self, job):
+        if isinstance(job, np.ndarray):
+            # Cache hit: a memory-mapped utterance, no Piper work.
+            # Written in slices: playback only starts at first audio, so
+            # one write larger than the ring would never return.
+            for start in range(0, len(job), CACHED_SLICE_FRAMES):
+                if self.stopped.is_set():
+                    break
+                self.ring.write(job[start:start + CACHED_SLICE_FRAMES], self.stopped)
+                self._mark_first_audio()
+            return
+        if self.stopped.is_set():
+            job.cancel()
+            return
+        pcm = [] if self.cache is not None else None
+        while True:
+            chunk = job.audio_queue.get()
+            if chunk is None:
+                break
+            if pcm is not None:
+                pcm.append(chunk)
+            self.ring.write_bytes(chunk, self.stopped)
+            self._mark_first_audio()
+            if self.stopped.is_set():
+                job.cancel()
+                break
+        complete = job.expected_bytes is not None and job.received_bytes >= job.expected_bytes
+        if pcm and complete and not job.cancelled.is_set():
+            self.cache.put(self.model_filename, job.text, b''.join(pcm))
+
+    def _mark_first_audio(self):
+        if self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+            self.first_audio.set()
+
+    def time_to_first_audio(self):
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.started_at
@@ -0,0 +1,74 @@
+import contextlib
+import importlib
+import sys
+import threading
+import time
+
+
+# Imported first by voice.py, so this is as close to process start as Python gets.
+PROCESS_START = time.perf_counter()
+STARTUP_BUDGET_SECONDS = 1.5   # process start to language picker on screen
+
+
+class StartupProfile:
+    """
+    Wall time of each import and initialization step from process start,
+    with the thread it ran on and how many modules it pulled in. Steps on
+    the main thread delay the window; the rest overlap with the user
+    choosing a language.
+    """
+
+    def __init__(self, budget_seconds=STARTUP_BUDGET_SECONDS):
+        self.budget_seconds = budget_seconds
+        self.steps = []
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def step(self, name, kind="init"):
+        before = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.steps.append({
+                    'kind': kind,
+                    'name': name,
+                    'thread': threading.current_thread().name,
+                    'start': start - PROCESS_START,
+                    'seconds': elapsed,
+                    'modules': len(sys.modules) - before,
+                })
+
+    def import_module(self, name):
+        with self.step(name, "import"):
+            return importlib.import_module(name)
+
+    def mark(self, name):
+        with self.lock:
+            self.marks[name] = time.perf_counter() - PROCESS_START
+
+    def report(self, budget_mark="language picker shown"):
+        with self.lock:
+            steps = sorted(self.steps, key=lambda s: s['start'])
+            marks = dict(self.marks)
+        print(f"{'step':38s} {'thread':12s} {'at ms':>8s} {'ms':>8s} {'+mods':>6s}")
+        for s in steps:
+            print(f"{s['kind'] + ' ' + s['name']:38s} {s['thread'][:12]:12s} {s['start'] * 1000:8.1f} "
+                  f"{s['seconds'] * 1000:8.1f} {s['modules']:6d}")
+        for kind in ("import", "init"):
+            for thread in sorted({s['thread'] for s in steps}):
+                total = sum(s['seconds'] for s in steps if s['kind'] == kind and s['thread'] == thread)
+                if total:
+                    print(f"total {kind} on {thread}: {total * 1000:.1f} ms")
+        for name, at in sorted(marks.items(), key=lambda m: m[1]):
+            print(f"{name}: {at * 1000:.1f} ms after start")
+        shown = marks.get(budget_mark)
+        if shown is not None:
+            verdict = "within" if shown <= self.budget_seconds else "OVER"
+            print(f"{budget_mark} at {shown:.2f}s, {verdict} the {self.budget_seconds:.2f}s budget")
+
+
+profile = StartupProfile()
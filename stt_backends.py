@@ -0,0 +1,180 @@
+import collections
+import concurrent.futures
+import hashlib
+import json
+import threading
+import time
+
+import speech_recognition
+
+
+class SttBackend:
+    """Base class: recognize() returns the transcript, or None if nothing was understood."""
+
+    name = "base"
+
+    def recognize(self, audio_data, lang_code):
+        raise NotImplementedError
+
+
+class GoogleSttBackend(SttBackend):
+    name = "google"
+
+    def __init__(self, operation_timeout=None):
+        self.recognizer = speech_recognition.Recognizer()
+        self.recognizer.operation_timeout = operation_timeout
+
+    def recognize(self, audio_data, lang_code):
+        # Encode once up front; recognize_google reuses the cached FLAC payload.
+        audio_data.get_flac_data(convert_width=2)
+        try:
+            return self.recognizer.recognize_google(audio_data, language=lang_code)
+        except speech_recognition.UnknownValueError:
+            return None
+
+
+def audio_key(audio_data):
+    return hashlib.sha1(audio_data.frame_data).hexdigest()
+
+
+class TranscriptMapBackend(SttBackend):
+    """
+    Offline stand-in: returns a fixed transcript per (audio hash, lang_code), or a
+    per-language default, after an optional simulated delay. Lets the voice loop
+    be exercised and timed without network access.
+    """
+
+    name = "local"
+
+    def __init__(self, transcripts=None, defaults=None, delay=0.0):
+        self.transcripts = dict(transcripts or {})
+        self.defaults = dict(defaults or {})
+        self.delay = delay
+
+    @classmethod
+    def from_file(cls, path, delay=0.0):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('transcripts'), data.get('defaults'), delay)
+
+    def add(self, audio_data, lang_code, text):
+        self.transcripts[f"{audio_key(audio_data)}:{lang_code}"] = text
+
+    def recognize(self, audio_data, lang_code):
+        if self.delay:
+            time.sleep(self.delay)
+        text = self.transcripts.get(f"{audio_key(audio_data)}:{lang_code}")
+        if text is None:
+            text = self.defaults.get(lang_code)
+        return text
+
+
+class LatencyStats:
+    def __init__(self, window=500):
+        self.window = window
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self.lock = threading.Lock()
+
+    def record(self, backend_name, lang_code, seconds):
+        with self.lock:
+            self.samples[(backend_name, lang_code)].append(seconds)
+
+    def summary(self):
+        with self.lock:
+            items = {key: sorted(values) for key, values in self.samples.items()}
+        result = {}
+        for (backend_name, lang_code), values in items.items():
+            if not values:
+                continue
+            result[(backend_name, lang_code)] = {
+                'count': len(values),
+                'p50_ms': values[int(0.50 * (len(values) - 1))] * 1000,
+                'p95_ms': values[int(0.95 * (len(values) - 1))] * 1000,
+            }
+        return result
+
+    def report(self):
+        for (backend_name, lang_code), s in sorted(self.summary().items()):
+            print(f"{backend_name:8s} {lang_code:6s} n={s['count']:4d} "
+                  f"p50={s['p50_ms']:8.1f} ms  p95={s['p95_ms']:8.1f} ms")
+
+
+class SttClient:
+    """
+    Runs a backend with a deadline. If hedge_after is set and the first attempt
+    hasn't answered by then, a second attempt (on the fallback backend if given)
+    races it and the first transcript wins.
+    """
+
+    def __init__(self, backend, timeout=8.0, hedge_after=None, fallback=None, stats=None, max_workers=4):
+        self.backend = backend
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.fallback = fallback
+        self.stats = stats or LatencyStats()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def _timed(self, backend, audio_data, lang_code):
+        start = time.perf_counter()
+        text = backend.recognize(audio_data, lang_code)
+        self.stats.record(backend.name, lang_code, time.perf_counter() - start)
+        return text
+
+    def recognize(self, audio_data, lang_code):
+        deadline = time.perf_counter() + self.timeout
+        futures = [self.executor.submit(self._timed, self.backend, audio_data, lang_code)]
+        if self.hedge_after is not None and self.hedge_after < self.timeout:
+            done, _ = concurrent.futures.wait(futures, timeout=self.hedge_after)
+            if not done:
+                hedge_backend = self.fallback or self.backend
+                futures.append(self.executor.submit(self._timed, hedge_backend, audio_data, lang_code))
+        error = None
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = concurrent.futures.wait(
+                pending, timeout=remaining, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        for future in pending:
+            future.cancel()
+        if error is not None:
+            raise error
+        raise speech_recognition.WaitTimeoutError(f"STT did not answer within {self.timeout:.1f}s")
+
+
+def make_stt_client(name="google", transcripts_path=None, **kwargs):
+    if name == "local":
+        backend = TranscriptMapBackend.from_file(transcripts_path) if transcripts_path else TranscriptMapBackend()
+    else:
+        backend = GoogleSttBackend()
+    return SttClient(backend, **kwargs)
+
+
+def benchmark(client, audio_items, runs=5):
+    """audio_items: list of (AudioData, lang_code). Prints p50/p95 per backend and language."""
+    for _ in range(runs):
+        for audio_data, lang_code in audio_items:
+            try:
+                client.recognize(audio_data, lang_code)
+            except Exception as e:
+                print(f"{lang_code}: {e}")
+    client.stats.report()
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    local = TranscriptMapBackend(defaults={
+        'en-IN': "has my money arrived",
+        'hi-IN': "क्या मेरा पैसा आ गया",
+        'ml-IN': "എന്റെ പണം വന്നോ",
+        'te-IN': "నా డబ్బు వచ్చిందా",
+    }, delay=0.02)
+    silence = speech_recognition.AudioData(np.zeros(16000, dtype=np.int16).tobytes(), 16000, 2)
+    benchmark(SttClient(local, timeout=1.0), [(silence, code) for code in local.defaults])
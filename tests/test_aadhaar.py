@@ -0,0 +1,29 @@
+from aadhaar import find_user_id
+
+
+def test_amount_is_not_a_record_id():
+    assert find_user_id("I received 2000 rupees") == ('unknown', 'none')
+
+
+def test_bare_number_reply_is_a_record_id():
+    assert find_user_id("it is 4567") == ('4567', 'short')
+
+
+def test_named_id_is_a_record_id():
+    assert find_user_id("my ID number is 4567 and I got nothing last month") == ('4567', 'short')
+
+
+def test_known_record_is_a_record_id():
+    assert find_user_id("has 13456 got the money this month", lambda run: run == '13456') == ('13456', 'short')
+
+
+def test_id_after_the_cue_beats_an_earlier_amount():
+    assert find_user_id("I got 2000 rupees last month, my aadhaar is 426456") == ('426456', 'short')
+
+
+def test_id_before_the_cue():
+    assert find_user_id("I got 2000 rupees and 426456 is my aadhaar") == ('426456', 'short')
+
+
+def test_known_record_beats_the_cue():
+    assert find_user_id("my id is 2000 no wait 13456", lambda run: run == '13456') == ('13456', 'short')
@@ -0,0 +1,46 @@
+import sqlite3
+
+import dbt_ingest
+
+
+HEADER = "user_id,credit_date,amount,scheme,reference\n"
+
+
+def write_file(path, *rows):
+    path.write_text(HEADER + "".join(row + "\n" for row in rows), encoding='utf-8')
+    return str(path)
+
+
+def test_overlapping_files_do_not_double_count(tmp_path):
+    db = str(tmp_path / "credits.db")
+    dbt_ingest.ingest(write_file(tmp_path / "a.csv", "426456,2025-08-15,2500,NREGA,TXN1"), db_path=db)
+    dbt_ingest.ingest(write_file(tmp_path / "b.csv", "426456,2025-08-15,2500,NREGA,TXN1",
+                                 "426456,2025-09-15,2500,NREGA,TXN2"), db_path=db)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT reference FROM credits ORDER BY reference").fetchall() == [('TXN1',), ('TXN2',)]
+    assert conn.execute("SELECT credit_date FROM latest_credit").fetchall() == [('2025-09-15',)]
+
+
+def test_non_iso_dates_are_rejected(tmp_path):
+    db = str(tmp_path / "credits.db")
+    dbt_ingest.ingest(write_file(tmp_path / "a.csv", "426456,15/08/2025,2500,NREGA,TXN1",
+                                 "426456,2025-8-15,2500,NREGA,TXN2",
+                                 "426456,2025-02-30,2500,NREGA,TXN3",
+                                 "426456,2025-08-15,2500,NREGA,TXN4"), db_path=db)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT reference FROM credits").fetchall() == [('TXN4',)]
+
+
+def test_corrupt_and_incomplete_records_are_rejected(tmp_path):
+    db = str(tmp_path / "credits.db")
+    path = tmp_path / "a.jsonl"
+    path.write_text("\n".join([
+        '{"user_id": "426456", "credit_date": "2025-08-15", "amount": 2500, "reference": "TXN1"}',
+        '{"user_id": "426456", "credit_date": "2025-09-15", "amo',
+        '{"user_id": "426456", "amount": 2500, "reference": "TXN3"}',
+        '[1, 2, 3]',
+        '{"user_id": "426456", "credit_date": "2025-10-15", "amount": 2500, "reference": "TXN5"}',
+    ]) + "\n", encoding='utf-8')
+    dbt_ingest.ingest(str(path), db_path=db)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT reference FROM credits ORDER BY reference").fetchall() == [('TXN1',), ('TXN5',)]
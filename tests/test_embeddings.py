@@ -0,0 +1,14 @@
+import json
+
+from embeddings import EmbeddingStore
+
+
+def test_torn_last_line_is_dropped_and_appends_continue(tmp_path):
+    path = tmp_path / "store.jsonl"
+    good = json.dumps({"hash": "a", "kind": "query", "text": "x", "embedding": [1.0]})
+    path.write_text(good + "\n" + '{"hash": "b", "kind": "que', encoding="utf-8")
+    store = EmbeddingStore(str(path))
+    assert "a" in store and "b" not in store
+    store.append([{"hash": "c", "kind": "query", "text": "y", "embedding": [2.0]}])
+    reloaded = EmbeddingStore(str(path))
+    assert reloaded.get("a") == [1.0] and reloaded.get("c") == [2.0]
@@ -0,0 +1,33 @@
+import pytest
+
+from intents import classify_intent
+
+
+@pytest.mark.parametrize("message", [
+    "show my last three payments",
+    "show my payment history",
+    "show my last few credits",
+])
+def test_show_phrasings_are_history(message):
+    # "how" must not match inside "show".
+    assert classify_intent(message) == 'history'
+
+
+@pytest.mark.parametrize("message", [
+    "how do I apply for NREGA",
+    "Am I eligible for PM-Kisan?",
+    "what documents do I need",
+])
+def test_open_questions(message):
+    assert classify_intent(message) == 'open'
+
+
+def test_status_question():
+    assert classify_intent("Has my money arrived?") == 'status'
+    assert classify_intent("मेरा पैसा आया क्या") == 'status'
+
+
+def test_indic_cue_inside_a_word_does_not_fire():
+    # "గత" (last) appears inside "స్వాగతం" (welcome); this asks whether the money came.
+    assert classify_intent("స్వాగతం, నా డబ్బు వచ్చిందా") == 'status'
+    assert classify_intent("గత చెల్లింపులు చూపించు") == 'history'
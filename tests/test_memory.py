@@ -0,0 +1,20 @@
+import time
+
+from memory import ConversationMemory
+
+
+def failing_summarize(summary, turns):
+    raise RuntimeError("LLM unavailable")
+
+
+def test_turns_stay_bounded_when_summaries_keep_failing():
+    memory = ConversationMemory(summarize=failing_summarize, keep_turns=2, max_turns=6)
+    for turn in range(50):
+        memory.add_turn(f"question {turn}", f"answer {turn}")
+        assert len(memory.turns) <= 6
+    deadline = time.monotonic() + 2
+    while memory.folding and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert memory.turns[-1] == ("question 49", "answer 49")
+    assert memory.dropped == 44
+    assert memory.summary == ""
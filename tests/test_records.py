@@ -0,0 +1,44 @@
+import shutil
+
+import dbt_ingest
+import records
+from aadhaar import find_user_id
+
+
+def copy_db(tmp_path):
+    path = str(tmp_path / "pragati.db")
+    shutil.copy(records.DB_PATH, path)
+    return path
+
+
+def test_store_reads_without_a_ledger_and_never_writes(tmp_path):
+    path = copy_db(tmp_path)
+    with open(path, 'rb') as f:
+        before = f.read()
+    store = records.RecordStore(path)
+    assert store.get('ramesh')['name'] == 'Ramesh'
+    assert store.last_credits('ramesh') == []
+    with open(path, 'rb') as f:
+        assert f.read() == before
+
+
+def test_store_picks_up_a_ledger_loaded_later(tmp_path):
+    path = copy_db(tmp_path)
+    store = records.RecordStore(path)
+    store.get('ramesh')
+    payments = tmp_path / "payments.csv"
+    payments.write_text("user_id,credit_date,amount,scheme,reference\nramesh,2025-08-15,2500,NREGA,TXN1\n",
+                        encoding='utf-8')
+    dbt_ingest.ingest(str(payments), db_path=path)
+    assert store.get('ramesh')['last_credit'] == "₹2500 on 15-Aug"
+    assert [c['amount'] for c in store.last_credits('ramesh')] == [2500]
+
+
+def test_spoken_demo_id_finds_its_record(tmp_path):
+    path = copy_db(tmp_path)
+    dbt_ingest.seed_demo_customers(path)
+    store = records.RecordStore(path)
+    for message, name in (("my aadhaar is 426456", "Sita"), ("one three four five six", "Ramesh")):
+        user_id, status = find_user_id(message, lambda run: store.get(run) is not None)
+        assert status == 'short'
+        assert store.get(user_id)['name'] == name
@@ -0,0 +1,24 @@
+import numpy as np
+
+from resample import StreamingResampler
+
+
+def tone_level_db(src_rate, dst_rate, freq, block=2205):
+    resampler = StreamingResampler(src_rate, dst_rate)
+    t = np.arange(src_rate * 2) / src_rate
+    x = (0.5 * np.sin(2 * np.pi * freq * t) * 32767).astype(np.int16)
+    y = np.concatenate([resampler.process(x[i:i + block]) for i in range(0, len(x), block)])
+    y = y[dst_rate // 2:].astype(np.float64)
+    spectrum = np.abs(np.fft.rfft(y * np.hanning(len(y))))
+    return 20 * np.log10(spectrum.max() / (0.5 * 32767 * len(y) / 4) + 1e-12)
+
+
+def test_capture_path_rejects_aliases():
+    # 9 kHz and 12 kHz would fold back to 7 kHz and 4 kHz at 16 kHz.
+    assert tone_level_db(44100, 16000, 9000) < -60
+    assert tone_level_db(44100, 16000, 12000) < -60
+
+
+def test_capture_path_keeps_the_speech_band():
+    for freq in (300, 1000, 3400, 6000):
+        assert tone_level_db(44100, 16000, freq) > -0.5
@@ -0,0 +1,36 @@
+from response_cache import ResponseCache
+
+
+def make_cache():
+    cache = ResponseCache(path=None)
+    cache.store("how do I apply for NREGA", "english:scope", "Apply at the gram panchayat.", 2.0)
+    return cache
+
+
+def test_rephrased_question_gets_the_cached_answer():
+    assert make_cache().fallback_lookup("how to apply for nrega?", "english:scope") == "Apply at the gram panchayat."
+
+
+def test_near_miss_question_gets_no_fallback_answer():
+    # Shares "apply" and "nrega" but asks about the job card.
+    assert make_cache().fallback_lookup("how do I apply for an NREGA job card", "english:scope") is None
+
+
+def test_other_scope_gets_no_answer():
+    assert make_cache().fallback_lookup("how do I apply for NREGA", "hindi:scope") is None
+
+
+def test_negated_question_gets_no_answer():
+    cache = ResponseCache(path=None)
+    cache.store("am I eligible for PM-Kisan", "english:scope", "Yes, you are eligible.", 2.0)
+    assert cache.lookup("am I not eligible for PM-Kisan", "english:scope") is None
+    assert cache.lookup("why isn't my PM-Kisan eligible", "english:scope") is None
+    assert cache.lookup("am I eligible for PM Kisan?", "english:scope") == "Yes, you are eligible."
+
+
+def test_negation_blocks_even_a_loose_match():
+    cache = ResponseCache(path=None)
+    cache.store("मेरा पैसा आया", "hindi:scope", "हाँ, ₹2000 आ गए।", 2.0)
+    assert cache.lookup("मेरा पैसा नहीं आया", "hindi:scope", threshold=0.1) is None
+    cache.store("എന്റെ പണം വന്നു", "malayalam:scope", "വന്നു.", 2.0)
+    assert cache.lookup("എന്റെ പണം വന്നില്ല", "malayalam:scope", threshold=0.1) is None
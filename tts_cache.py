@@ -0,0 +1,145 @@
+import collections
+import hashlib
+import os
+import threading
+import unicodedata
+
+import numpy as np
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def normalize_text(text):
+    """The same whitespace folding piper_pool.frame_utterance applies, plus NFC."""
+    return unicodedata.normalize('NFC', ' '.join(text.split()))
+
+
+def cache_key(model_filename, text):
+    return hashlib.sha1(f"{model_filename}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+class TtsCache:
+    """
+    Raw int16 PCM per (voice, normalized text), one file per utterance named by
+    its hash. Hits are returned as read-only memory maps, so replaying a phrase
+    costs page-cache reads instead of a Piper run. Recency is kept in file
+    mtimes, which makes the LRU order survive restarts.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()   # key -> size in bytes, oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.pcm'):
+                st = entry.stat()
+                found.append((st.st_mtime, entry.name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pcm')
+
+    def get(self, model_filename, text):
+        key = cache_key(model_filename, text)
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            os.utime(path)
+            return np.memmap(path, dtype=np.int16, mode='r')
+        except (OSError, ValueError):
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+
+    def __contains__(self, item):
+        model_filename, text = item
+        with self.lock:
+            return cache_key(model_filename, text) in self.entries
+
+    def put(self, model_filename, text, pcm_bytes):
+        usable = len(pcm_bytes) - len(pcm_bytes) % 2
+        if usable == 0:
+            return
+        key = cache_key(model_filename, text)
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(pcm_bytes[:usable])
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not write TTS cache entry: {e}")
+            return
+        with self.lock:
+            self.total_bytes += usable - self.entries.pop(key, 0)
+            self.entries[key] = usable
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'megabytes': round(self.total_bytes / 1e6, 1),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def collect_job(job):
+    """Drains a PiperJob; returns its PCM, or None if it was cancelled or cut short."""
+    chunks = []
+    while True:
+        chunk = job.audio_queue.get()
+        if chunk is None:
+            break
+        chunks.append(chunk)
+    if job.cancelled.is_set() or job.expected_bytes is None or job.received_bytes < job.expected_bytes:
+        return None
+    return b''.join(chunks)
+
+
+def prerender(cache, pool, model_filename, texts):
+    """Synthesizes whatever in texts is not cached yet, one utterance at a time."""
+    rendered = 0
+    for text in texts:
+        if (model_filename, text) in cache:
+            continue
+        pcm = collect_job(pool.submit(model_filename, text))
+        if pcm:
+            cache.put(model_filename, text, pcm)
+            rendered += 1
+    return rendered
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TtsCache()
+        return _cache
@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+import unicodedata
+
+import numpy as np
+import onnxruntime
+
+from piper_pool import PIPER_DIR, TTS_PARALLEL, PiperJob, lang_map
+from ring_buffer import PcmRingBuffer
+from speech_stream import TtsChunkFeeder, split_speakable
+
+try:
+    from piper_phonemize import phonemize_espeak
+except ImportError:
+    phonemize_espeak = None
+
+
+ESPEAK_DATA = os.path.join(PIPER_DIR, 'espeak-ng-data')
+ESPEAK_EXECUTABLE = os.environ.get("PRAGATI_ESPEAK", "espeak-ng")
+INTRA_OP_THREADS = int(os.environ.get("PRAGATI_TTS_THREADS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+PARALLEL_SENTENCES = TTS_PARALLEL or max(1, (os.cpu_count() or 1) // INTRA_OP_THREADS)
+
+# Piper's phoneme id conventions: every utterance is ^ ... $ and every
+# phoneme is followed by the pad symbol.
+PAD, BOS, EOS = "_", "^", "$"
+
+SAMPLE_TEXTS = {
+    "en_GB-northern_english_male-medium.onnx":
+        "Hello! Your PM-Kisan instalment of two thousand rupees was credited last week. Is there anything else I can check for you?",
+    "hi_IN-pratham-medium.onnx":
+        "नमस्ते! आपकी पीएम किसान की किस्त पिछले हफ्ते जमा हो गई है। क्या मैं आपकी और कोई मदद कर सकता हूँ?",
+    "ml_IN-arjun-medium.onnx":
+        "നമസ്കാരം! നിങ്ങളുടെ പിഎം കിസാൻ ഗഡു കഴിഞ്ഞ ആഴ്ച ലഭിച്ചു. മറ്റെന്തെങ്കിലും സഹായം വേണോ?",
+    "te_IN-maya-medium.onnx":
+        "నమస్కారం! మీ పీఎం కిసాన్ వాయిదా గత వారం జమ అయింది. ఇంకేమైనా సహాయం కావాలా?",
+}
+
+
+def load_config(model_filename):
+    with open(os.path.join(PIPER_DIR, model_filename + '.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def phonemize(text, espeak_voice):
+    """
+    Returns one list of phonemes per sentence. Uses piper_phonemize (the same
+    espeak-ng calls piper.exe makes) when it is installed, otherwise the
+    espeak-ng command line; both read the bundled espeak-ng-data.
+    """
+    if phonemize_espeak is not None:
+        return phonemize_espeak(text, espeak_voice, data_path=ESPEAK_DATA)
+    result = subprocess.run(
+        [ESPEAK_EXECUTABLE, "-q", "--ipa", "-v", espeak_voice, f"--path={PIPER_DIR}"],
+        input=text.encode('utf-8'),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True
+    )
+    sentences = []
+    for line in result.stdout.decode('utf-8').splitlines():
+        line = line.strip()
+        if line:
+            sentences.append(list(unicodedata.normalize('NFD', line)))
+    return sentences
+
+
+def float_to_int16(audio):
+    # Same peak normalization piper applies to its float output.
+    audio = audio * (32767.0 / max(0.01, float(np.max(np.abs(audio)))))
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+class OnnxVoice:
+    """
+    One Piper voice loaded into an ONNX Runtime CPU session. The session is
+    created once and reused; synthesize() yields int16 PCM one sentence at a
+    time so playback can start after the first.
+    """
+
+    def __init__(self, model_filename, threads=INTRA_OP_THREADS):
+        self.model_filename = model_filename
+        self.config = load_config(model_filename)
+        self.sample_rate = int(self.config['audio']['sample_rate'])
+        self.espeak_voice = self.config['espeak']['voice']
+        self.id_map = self.config['phoneme_id_map']
+        inference = self.config.get('inference', {})
+        self.scales = np.array([
+            inference.get('noise_scale', 0.667),
+            inference.get('length_scale', 1.0),
+            inference.get('noise_w', 0.8)
+        ], dtype=np.float32)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        start = time.perf_counter()
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(PIPER_DIR, model_filename),
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self.load_seconds = time.perf_counter() - start
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def phoneme_ids(self, phonemes):
+        ids = list(self.id_map[BOS]) + list(self.id_map[PAD])
+        for phoneme in phonemes:
+            if phoneme in self.id_map:
+                ids += self.id_map[phoneme]
+                ids += self.id_map[PAD]
+        ids += self.id_map[EOS]
+        return ids
+
+    def synthesize_ids(self, ids):
+        inputs = {
+            'input': np.array([ids], dtype=np.int64),
+            'input_lengths': np.array([len(ids)], dtype=np.int64),
+            'scales': self.scales,
+        }
+        if 'sid' in self.input_names:
+            inputs['sid'] = np.array([0], dtype=np.int64)
+        audio = self.session.run(None, inputs)[0]
+        return float_to_int16(audio.reshape(-1))
+
+    def synthesize(self, text, cancelled=None):
+        for phonemes in phonemize(text, self.espeak_voice):
+            if cancelled is not None and cancelled.is_set():
+                return
+            yield self.synthesize_ids(self.phoneme_ids(phonemes))
+
+
+class OnnxWorker:
+    """
+    Drop-in for PiperWorker: serves PiperJobs for one voice, loading the voice
+    on first use. parallel dispatch threads share the one session (ONNX
+    Runtime runs are thread-safe and release the GIL), so that many sentences
+    render at once without loading the model again. Cancellation takes effect
+    at the next sentence boundary, so reset() needs no process restart.
+    """
+
+    def __init__(self, model_filename, threads=INTRA_OP_THREADS, parallel=PARALLEL_SENTENCES):
+        self.model_filename = model_filename
+        self.threads = threads
+        self.parallel = parallel
+        self.voice = None
+        self.jobs = queue.Queue()
+        self.active = set()
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.ready = threading.Event()
+        self.closing = False
+        self.dispatchers = []
+
+    def start(self):
+        if self.dispatchers:
+            return
+        for _ in range(self.parallel):
+            dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+            dispatcher.start()
+            self.dispatchers.append(dispatcher)
+
+    def submit(self, text):
+        job = PiperJob(text)
+        self.jobs.put(job)
+        return job
+
+    def close(self):
+        self.closing = True
+        for _ in self.dispatchers:
+            self.jobs.put(None)
+
+    def reset(self):
+        with self.lock:
+            jobs = list(self.active)
+        for job in jobs:
+            job.cancel()
+        return bool(jobs)
+
+    def _ensure_voice(self):
+        with self.load_lock:
+            if self.voice is None:
+                try:
+                    self.voice = OnnxVoice(self.model_filename, self.threads)
+                    print(f"Loaded {self.model_filename} in {self.voice.load_seconds * 1000:.0f} ms "
+                          f"({self.threads} intra-op threads x {self.parallel} sentences)")
+                except Exception as e:
+                    print(f"Could not load ONNX voice {self.model_filename}: {e}")
+                    return False
+        self.ready.set()
+        return True
+
+    def _dispatch_loop(self):
+        while not self.closing:
+            job = self.jobs.get()
+            if job is None:
+                break
+            if job.cancelled.is_set() or not job.text.strip() or not self._ensure_voice():
+                job.finish()
+                continue
+            with self.lock:
+                self.active.add(job)
+            job.submitted_at = time.perf_counter()
+            try:
+                for pcm in self.voice.synthesize(' '.join(job.text.split()), job.cancelled):
+                    chunk = pcm.tobytes()
+                    job.received_bytes += len(chunk)
+                    job.put(chunk)
+                if not job.cancelled.is_set():
+                    job.expected_bytes = job.received_bytes
+            except Exception as e:
+                print(f"ONNX synthesis failed for {self.model_filename}: {e}")
+            finally:
+                with self.lock:
+                    self.active.discard(job)
+                job.finish()
+
+
+class OnnxPool:
+    """Same interface as PiperPool, backed by in-process ONNX Runtime sessions."""
+
+    def __init__(self, models=None, threads=INTRA_OP_THREADS, parallel=PARALLEL_SENTENCES):
+        self.threads = threads
+        self.parallel = parallel
+        self.workers = {name: OnnxWorker(name, threads, parallel) for name in (models or lang_map.values())}
+
+    def start(self, warm_up=True):
+        for worker in self.workers.values():
+            worker.start()
+            if warm_up:
+                worker.submit(".")
+
+    def submit(self, model_filename, text):
+        worker = self.workers.get(model_filename)
+        if worker is None:
+            worker = self.workers[model_filename] = OnnxWorker(model_filename, self.threads, self.parallel)
+            worker.start()
+        return worker.submit(text)
+
+    def reset(self, model_filename):
+        worker = self.workers.get(model_filename)
+        return worker.reset() if worker is not None else False
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.close()
+
+
+def report_realtime_factor(threads=INTRA_OP_THREADS, runs=3):
+    """Per voice: session load time, first-sentence latency and real-time factor (synthesis / audio seconds)."""
+    print(f"phonemizer: {'piper_phonemize' if phonemize_espeak is not None else ESPEAK_EXECUTABLE}, "
+          f"intra-op threads: {threads}")
+    for model_filename, text in SAMPLE_TEXTS.items():
+        if not os.path.exists(os.path.join(PIPER_DIR, model_filename)):
+            print(f"{model_filename:45s} missing, skipped")
+            continue
+        voice = OnnxVoice(model_filename, threads)
+        list(voice.synthesize("."))
+        best_first, best_rtf = float('inf'), float('inf')
+        for _ in range(runs):
+            start = time.perf_counter()
+            first, samples = None, 0
+            for pcm in voice.synthesize(text):
+                if first is None:
+                    first = time.perf_counter() - start
+                samples += len(pcm)
+            elapsed = time.perf_counter() - start
+            best_first = min(best_first, first or elapsed)
+            best_rtf = min(best_rtf, elapsed / max(samples / voice.sample_rate, 1e-9))
+        print(f"{model_filename:45s} load: {voice.load_seconds * 1000:7.1f} ms   "
+              f"first sentence: {best_first * 1000:7.1f} ms   RTF: {best_rtf:.3f}")
+
+
+def scheme_sentences(count, path="schemes.txt"):
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return list(split_speakable([text]))[:count]
+
+
+def report_parallel_scaling(model_filename=lang_map['en-IN'], sentences=10, threads=1):
+    """
+    Wall time to render a sentences-long scheme answer through a feeder (in
+    order, into one ring) with 1, 2, 4 ... sentences in flight, up to the
+    core count.
+    """
+    chunks = scheme_sentences(sentences)
+    sample_rate = load_config(model_filename)['audio']['sample_rate']
+    levels, level = [], 1
+    while level <= max(1, (os.cpu_count() or 1) // threads):
+        levels.append(level)
+        level *= 2
+    print(f"{len(chunks)} sentences from schemes.txt, {threads} intra-op thread(s) per sentence")
+    baseline = None
+    for parallel in levels:
+        pool = OnnxPool([model_filename], threads, parallel)
+        pool.start()
+        pool.workers[model_filename].ready.wait(60)
+        ring = PcmRingBuffer(sample_rate * 600)
+        start = time.perf_counter()
+        feeder = TtsChunkFeeder(pool, model_filename, iter(chunks), ring, max_in_flight=parallel)
+        feeder.start()
+        feeder.finished.wait()
+        elapsed = time.perf_counter() - start
+        pool.close()
+        baseline = baseline or elapsed
+        print(f"{parallel:2d} in flight: {elapsed:6.2f} s wall, first audio {feeder.time_to_first_audio() * 1000:7.1f} ms, "
+              f"{ring.frames_written / sample_rate:5.1f} s audio, speed-up x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Real-time factor of the in-process ONNX voices.")
+    parser.add_argument("--threads", type=int, default=INTRA_OP_THREADS, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--scaling", type=int, metavar="SENTENCES", help="time a SENTENCES-long answer at 1, 2, 4 ... sentences in flight")
+    args = parser.parse_args()
+    if args.scaling:
+        report_parallel_scaling(sentences=args.scaling, threads=args.threads)
+    else:
+        report_realtime_factor(args.threads, args.runs)
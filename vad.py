@@ -0,0 +1,113 @@
+import collections
+import numpy as np
+
+
+SUBFRAME_MS = 10
+
+
+def frame_features(samples, sample_rate, subframe_ms=SUBFRAME_MS):
+    """
+    Splits a block into subframes and returns per-subframe energy (dBFS) and
+    zero-crossing rate, computed without a Python loop.
+    """
+    x = np.asarray(samples).reshape(-1)
+    if x.dtype == np.int16:
+        x = x.astype(np.float32) / 32768.0
+    length = max(int(sample_rate * subframe_ms / 1000), 1)
+    count = len(x) // length
+    if count == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+    frames = x[:count * length].reshape(count, length)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (length - 1)
+    return energy_db, zcr
+
+
+class VoiceActivityDetector:
+    """
+    Energy / zero-crossing VAD over the capture blocks. feed() returns 'start' on
+    speech onset, 'end' once trailing silence exceeds the hangover, else None.
+    Blocks seen before onset are kept in a pre-roll so the first syllable isn't lost.
+    """
+
+    def __init__(self, sample_rate, block_ms=50, energy_margin_db=12.0, min_energy_db=-55.0,
+                 noise_zcr=0.45, onset_ms=150, hangover_ms=700, pre_roll_ms=300,
+                 max_utterance_s=15.0):
+        self.sample_rate = sample_rate
+        self.block_ms = block_ms
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.noise_zcr = noise_zcr
+        self.onset_blocks = max(int(onset_ms / block_ms), 1)
+        self.hangover_blocks = max(int(hangover_ms / block_ms), 1)
+        self.max_blocks = int(max_utterance_s * 1000 / block_ms)
+        self.pre_roll = collections.deque(maxlen=max(int(pre_roll_ms / block_ms), 0) + self.onset_blocks)
+        self.noise_floor_db = -60.0
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.speech_run = 0
+        self.silence_run = 0
+        self.utterance_blocks = 0
+        self.pre_roll.clear()
+
+    def threshold_db(self):
+        return max(self.noise_floor_db + self.energy_margin_db, self.min_energy_db)
+
+    def is_speech(self, block):
+        energy_db, zcr = frame_features(block, self.sample_rate)
+        if len(energy_db) == 0:
+            return False
+        threshold = self.threshold_db()
+        # Broadband noise (fans, hiss) crosses zero constantly; only accept it when clearly loud.
+        speech = (energy_db > threshold) & ((zcr < self.noise_zcr) | (energy_db > threshold + 10.0))
+        if not self.in_speech and not speech.any():
+            # Track the background level while nobody is talking.
+            level = float(np.median(energy_db))
+            self.noise_floor_db += 0.05 * (level - self.noise_floor_db)
+        return np.count_nonzero(speech) * 2 >= len(speech)
+
+    def feed(self, block):
+        speech = self.is_speech(block)
+        if not self.in_speech:
+            self.pre_roll.append(block)
+            self.speech_run = self.speech_run + 1 if speech else 0
+            if self.speech_run >= self.onset_blocks:
+                self.in_speech = True
+                self.silence_run = 0
+                self.utterance_blocks = self.speech_run
+                return 'start'
+            return None
+        self.utterance_blocks += 1
+        self.silence_run = 0 if speech else self.silence_run + 1
+        if self.silence_run >= self.hangover_blocks or self.utterance_blocks >= self.max_blocks:
+            self.in_speech = False
+            self.speech_run = 0
+            self.pre_roll.clear()
+            return 'end'
+        return None
+
+    def take_pre_roll(self):
+        blocks = list(self.pre_roll)
+        self.pre_roll.clear()
+        return blocks
+
+
+def trim_silence(samples, sample_rate, threshold_db=None, margin_ms=120):
+    """Drops leading and trailing silence, keeping a short margin around the speech."""
+    energy_db, _ = frame_features(samples, sample_rate)
+    if len(energy_db) == 0:
+        return samples
+    if threshold_db is None:
+        # Relative to both the quietest and loudest parts, so all-speech takes aren't cut.
+        threshold_db = max(min(float(np.percentile(energy_db, 10)) + 12.0, float(energy_db.max()) - 30.0), -55.0)
+    voiced = np.flatnonzero(energy_db > threshold_db)
+    if len(voiced) == 0:
+        return samples
+    frame_len = max(int(sample_rate * SUBFRAME_MS / 1000), 1)
+    margin = int(sample_rate * margin_ms / 1000)
+    start = max(voiced[0] * frame_len - margin, 0)
+    end = min((voiced[-1] + 1) * frame_len + margin, len(samples))
+    return samples[start:end]
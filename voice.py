@@ -1,50 +1,123 @@
-import sounddevice as sd
-import numpy as np 
-import speech_recognition
-from pick import pick
+import startup  # first, so the startup profile's clock starts with the process
 import wave
 import time
 import threading
 import os
 import queue
+import collections
 import sys
-import re
-import subprocess
+import uuid
+with startup.profile.step("audio pipeline (numpy, piper_pool, playback)", "import"):
+    import piper_pool
+    import tts_cache
+    import playback
+    from speech_stream import split_speakable
+    from vad import VoiceActivityDetector, trim_silence
+    from resample import StreamingResampler
 import tkinter as tk
-from types import GeneratorType
 # from dotenv import load_dotenv
 
-from PIL import Image
 import io
 import base64
 
-import customtkinter
+# sounddevice, speech_recognition, PIL and custom (LangChain) are imported by
+# warm_up() on a background thread while the language picker is showing.
+customtkinter = startup.profile.import_module("customtkinter")
 
 # load_dotenv()
 # key = os.environ.get('API_KEY')
 
 OUTPUT_FILENAME = "test_sd.wav"
+DEBUG_CAPTURE = False  # also write each captured turn to a timestamped WAV
+HANDS_FREE = False  # start/stop recording on detected speech instead of the mic button
 SAMPLE_RATE = 44100
+STT_SAMPLE_RATE = 16000  # capture is resampled to this as it arrives
 CHANNELS = 1 
 DEVICE = None 
 BLOCK_DURATION_MS = 50 
+CHAT_HISTORY_TURNS = 50  # the prompt's view of the conversation is bounded separately (memory.py)
+BARGE_IN = True  # pressing the mic (or, hands-free, talking over the agent) stops the reply
+BARGE_IN_MARGIN_DB = 24.0  # hands-free: speech must be this far above the floor, which includes the agent's own echo
 
 
-sr = speech_recognition.Recognizer()
+# Bound by warm_up() on its background thread.
+sd = speech_recognition = to_audio_data = stt_client = None
+initial_greeting = achat_gen = stream_sync = None
 output_path = os.path.join(".", OUTPUT_FILENAME)
 audio_queue = queue.Queue()
 is_recording = False
-recorded_frames = []
+recorded_frames = None
+capture_resampler = StreamingResampler(SAMPLE_RATE, STT_SAMPLE_RATE)
 stream = None
 writer_thread = None
 stop_writer = threading.Event() 
+backend_ready = threading.Event()  # set by warm_up() once it has finished, successfully or not
+backend_error = None  # what the last warm_up() could not bring up; the chat screen needs both
+picker_shown = threading.Event()
+READY_POLL_MS = 100
 
 TRANSPARENT_COLOR = '#abcdef'
 lang_name = "English"
 lang_code = "en-IN"
 
-chat_history = []
+AGENT_LANGUAGES = {
+    'en-IN': 'english',
+    'hi-IN': 'hindi',
+    'ml-IN': 'malayalam',
+    'te-IN': 'telugu'
+}
+
+chat_history = collections.deque(maxlen=CHAT_HISTORY_TURNS)
+session_id = uuid.uuid4().hex
 is_button_active_global = False
+chat_screen_active = False
+agent_speaking = playback.get_engine().speaking  # set while an utterance is audible
+vad_detector = VoiceActivityDetector(STT_SAMPLE_RATE, block_ms=BLOCK_DURATION_MS)
+barge_in_detector = VoiceActivityDetector(STT_SAMPLE_RATE, block_ms=BLOCK_DURATION_MS,
+                                          energy_margin_db=BARGE_IN_MARGIN_DB, onset_ms=250)
+current_turn = None
+barge_in_latencies = []
+
+
+class AgentTurn:
+    """
+    Everything one spoken reply has in flight: the LLM stream and its queued
+    utterance. interrupt() stops both from any thread.
+    """
+
+    def __init__(self, llm=None):
+        self.llm = llm
+        self.utterance = None
+        self.model_filename = None
+        self.interrupted = threading.Event()
+
+    def interrupt(self, pressed_at=None):
+        """Returns seconds from pressed_at until the output stream was silenced."""
+        pressed_at = pressed_at or time.perf_counter()
+        if self.interrupted.is_set():
+            return None
+        self.interrupted.set()
+        # Drops this reply and anything queued behind it (e.g. a greeting still playing).
+        playback.get_engine().interrupt()
+        silenced = time.perf_counter() - pressed_at
+        if self.llm is not None:
+            self.llm.cancel()
+        if self.model_filename is not None:
+            threading.Thread(target=piper_pool.get_pool().reset, args=(self.model_filename,), daemon=True).start()
+        return silenced
+
+
+def barge_in(pressed_at=None):
+    turn = current_turn
+    if not BARGE_IN or turn is None:
+        return
+    silenced = turn.interrupt(pressed_at)
+    if silenced is None:
+        return
+    barge_in_latencies.append(silenced)
+    ordered = sorted(barge_in_latencies)
+    print(f"Barge-in: mic press to silence {silenced * 1000:.1f} ms "
+          f"(p50 {ordered[len(ordered) // 2] * 1000:.1f} ms, max {ordered[-1] * 1000:.1f} ms over {len(ordered)})")
 
 BACK_ARROW_B64 = b"iVBORw0KGgoAAAANSUhEUgAAADIAAAAyCAYAAAAeP4ixAAAACXBIWXMAAAsTAAALEwEAmpwYAAAB10lEQVR4nO3XPY9MURzA4bNIWLEKEhIaiUq8RLOFhsLLB0AkohGFaDQSoaRCoaCi2YR6s6g0KDReQr8KIgqFRCLeVpb1yM2eSS6ZmZ3NPTN3jtznA5x7f5m55/xPCI1Go9FoNBr/N2zGSzwMucIefBCFHOEkZlsR2YVgOSbKAdmFYAOetovIJgS78L5TRBYhOIbv3SKGOgRLcXmhgKEOwdribLA4nzCNx5jEBRzA6roituONdObwHKexZlARh/BF//zAbWzqV8AILuK3wZjBFYyljFiFKfV4hR2pQp6p1zccSRHS8bQeoF/FeVU1ZAx3hiTmcIqP/VzcKuv0FVsrxQxo++3FNFamOhBf1xxzqXJIhRElpdkkf7EYswzXFvHwUayL9/hxHMRZ3Ig74183yh5MJgkpBZ2Io0VXPawzGu/5V/Guh5A5bBvqi1XcJffi/gJj0c2kIfHhG7tNARXWHY/TcTufixEqbcn8Q1fgVsqQApbgPH62Wbr6+NIJzsSTOElIC/bFQ7FsIvQT9uNjypACdscxv6X4NkdCP8Wt9gUeJF73+D+/ys6QK9wthZwKucKW0hB7PeQM92LIo5AzHI0hb0POsD6GzITcmR9jntT9Ho1GI9TjD22H/Nq+o1wxAAAAAElFTkSuQmCC"
 
@@ -87,55 +160,65 @@ customtkinter.set_appearance_mode("dark")
 # }.get(lang_code, 'english')
 
 
-def get_agent_response(user_text):
-    from custom import chat_gen  
-
-    response = ""
-    agent_stream = chat_gen(user_text, language_for_agent, history=chat_history, return_buffer=False)
-    
-    if isinstance(agent_stream, GeneratorType):
-        for token in agent_stream:
-            response += token
-    else:
-        response = agent_stream  
-    
-    chat_history.append([user_text, response])
-    
-    return response
-
-
-
 def audio_callback(indata, frames, time, status):
     if status:
         print(status, file=sys.stderr)
     audio_queue.put(indata.copy())
 
-def save_recording():
-    global recorded_frames
-    if not recorded_frames:
+def take_recording():
+    samples = recorded_frames.take()
+    if len(samples) == 0:
         print("No audio data recorded.")
-        return
-
-    print(f"Saving {len(recorded_frames)} frames to {output_path}...")
-    wf = wave.open(output_path, 'wb')
+        return None
+    trimmed = trim_silence(samples, STT_SAMPLE_RATE)
+    print(f"Trimmed silence: {len(samples) / STT_SAMPLE_RATE:.2f}s -> {len(trimmed) / STT_SAMPLE_RATE:.2f}s")
+    samples = trimmed
+    if DEBUG_CAPTURE:
+        save_recording(samples)
+    return to_audio_data(samples, STT_SAMPLE_RATE)
+
+
+def save_recording(audio_data_int16):
+    # Debug only: the STT path works from memory.
+    root, ext = os.path.splitext(output_path)
+    debug_path = f"{root}_{time.strftime('%Y%m%d-%H%M%S')}_{threading.get_ident()}{ext}"
+    print(f"Saving {len(audio_data_int16)} samples to {debug_path}...")
+    wf = wave.open(debug_path, 'wb')
     wf.setnchannels(CHANNELS)
-    audio_data = np.concatenate(recorded_frames)
-    audio_data_int16 = (audio_data * 32767).astype(np.int16)
-    bytes_per_sample = audio_data_int16.dtype.itemsize
-    wf.setsampwidth(bytes_per_sample)
-    wf.setframerate(SAMPLE_RATE)
+    wf.setsampwidth(audio_data_int16.dtype.itemsize)
+    wf.setframerate(STT_SAMPLE_RATE)
     wf.writeframes(audio_data_int16.tobytes())
     wf.close()
-    print(f"Recording saved successfully to {output_path}")
-    recorded_frames = [] 
-    return OUTPUT_FILENAME
+    print(f"Recording saved successfully to {debug_path}")
+    return debug_path
 
 
 def process_audio_queue():
     global recorded_frames, is_recording
     while not stop_writer.is_set():
         try:
-            data = audio_queue.get(timeout=0.1)
+            data = capture_resampler.process(audio_queue.get(timeout=0.1))
+            if HANDS_FREE and BARGE_IN and chat_screen_active and agent_speaking.is_set() and not is_recording:
+                if barge_in_detector.feed(data) == 'start':
+                    detected_at = time.perf_counter()
+                    start_recording_flag(detected_at)
+                    for block in barge_in_detector.take_pre_roll():
+                        recorded_frames.append(block)
+                    barge_in_detector.reset()
+                    rootmain.after(0, set_record_button, True)
+                continue
+            if HANDS_FREE and chat_screen_active and not agent_speaking.is_set():
+                event = vad_detector.feed(data)
+                if event == 'start' and not is_recording:
+                    start_recording_flag()
+                    for block in vad_detector.take_pre_roll():
+                        recorded_frames.append(block)
+                    rootmain.after(0, set_record_button, True)
+                    continue
+                if event == 'end' and is_recording:
+                    recorded_frames.append(data)
+                    rootmain.after(0, toggle_recording)
+                    continue
             if is_recording:
                 recorded_frames.append(data)
         except queue.Empty:
@@ -145,10 +228,11 @@ def process_audio_queue():
             time.sleep(0.1)
 
 
-def start_recording_flag():
+def start_recording_flag(pressed_at=None):
     global is_recording, recorded_frames
     if not is_recording:
-        
+        barge_in(pressed_at)
+        recorded_frames.clear()
         is_recording = True
 
 
@@ -158,25 +242,50 @@ def process_and_respond(user_text):
     It gets the agent response and then plays the audio,
     ensuring the GUI does not freeze.
     """
-    agent_response = ""
-    agent_stream_generator = chat_gen(user_text, language_for_agent, history=chat_history, return_buffer=False)
-    for token in agent_stream_generator:
-        agent_response += token
-    
-    if agent_response:
+    turn_start = time.perf_counter()
+    first_token_at = None
+    agent_tokens = []
+    recorded = False
+    # All turns share custom's LLM event loop; this thread only drives playback.
+    turn = AgentTurn(stream_sync(achat_gen(user_text, language_for_agent, history=chat_history,
+                                           return_buffer=False, session_id=session_id)))
+
+    def record(agent_response):
+        nonlocal recorded
+        if recorded or not agent_response:
+            return
+        recorded = True
         print("\n[ Agent Response ]:", agent_response)
         chat_history.append([user_text, agent_response])
-
         rootmain.after(0, lambda: display_message(agent_response, 'agent'))
-        out(agent_response)
+
+    def tokens():
+        nonlocal first_token_at
+        for token in turn.llm:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            agent_tokens.append(token)
+            yield token
+        if not turn.interrupted.is_set():
+            record("".join(agent_tokens))
+
+    utterance = out_stream(tokens(), turn)
+    if turn.interrupted.is_set():
+        # Keep what was generated before the user cut in, so the next turn has context.
+        partial = "".join(agent_tokens).strip()
+        record(partial + " …" if partial else "")
+    if first_token_at is not None and utterance is not None and utterance.first_audio_at is not None:
+        print(f"LLM first token: {(first_token_at - turn_start) * 1000:.0f} ms, "
+              f"first audio: {(utterance.first_audio_at - turn_start) * 1000:.0f} ms")
 
 def stop_recording_flag():
     global is_recording
     if is_recording:
         
         is_recording = False
-        filea = save_recording() 
-        text1 = recognition(filea)
+        vad_detector.reset()
+        audio_data = take_recording()
+        text1 = recognition(audio_data) if audio_data is not None else None
         if text1:
             display_message(text1, 'user')
             
@@ -186,197 +295,64 @@ def stop_recording_flag():
 
 
 def synthesize_speech_ffplay(text, model_filename):
-    piper_executable = os.path.join(os.getcwd(), 'piper', 'piper.exe')
-    model_path = os.path.join(os.getcwd(), 'piper', model_filename)
-    
-    if not os.path.exists(piper_executable):
-        print(f"Error: Piper executable not found at {piper_executable}")
-        return
-    if not os.path.exists(model_path):
-        print(f"Error: Piper model not found at {model_path}")
-        return
-
-    sample_rate = 22050
-    channels = 1
-    dtype = 'int16'
-    bytes_per_sample = np.dtype(dtype).itemsize
-
-    piper_command_list = [
-        piper_executable,
-        "-m", model_path,
-        "--output-raw"
-    ]
-
-    audio_queue = queue.Queue(maxsize=200)
-    piper_process = None
-    stream = None
-    reader_thread = None
-    
-    stop_event = threading.Event()
-    playback_finished_event = threading.Event()
-    
-    internal_callback_buffer = bytearray()
-
-    def piper_reader_thread_func(proc_stdout, audio_q, stop_evt):
-        try:
-            while not stop_evt.is_set():
-                chunk = proc_stdout.read(1024 * bytes_per_sample * channels)
-                if not chunk:
-                    break
-                audio_q.put(chunk)
-        except Exception:
-            pass 
-        finally:
-            audio_q.put(None)
+    return speak_chunks([text], model_filename)
 
-    def sounddevice_callback(outdata, frames, time_info, status):
-        nonlocal internal_callback_buffer
-        if status:
-            print(f"Sounddevice callback status: {status}", flush=True)
-            
-
-        requested_bytes = frames * bytes_per_sample * channels
-        
-        while len(internal_callback_buffer) < requested_bytes:
-            try:
-                chunk = audio_queue.get(block=True, timeout=0.05) 
-                if chunk is None:
-                    audio_queue.put(None) 
-                    if len(internal_callback_buffer) > 0:
-                        available_frames = len(internal_callback_buffer) // (bytes_per_sample * channels)
-                        actual_frames_to_copy = min(frames, available_frames)
-                        
-                        data_to_play = np.frombuffer(internal_callback_buffer[:actual_frames_to_copy * bytes_per_sample * channels], dtype=dtype).reshape(-1, channels)
-                        outdata[:actual_frames_to_copy] = data_to_play
-                        
-                        if actual_frames_to_copy < frames:
-                            outdata[actual_frames_to_copy:] = 0 
-                        internal_callback_buffer = internal_callback_buffer[actual_frames_to_copy * bytes_per_sample * channels:]
-                    else:
-                        outdata[:] = 0
-                    raise sd.CallbackStop("End of audio stream signaled.")
-                internal_callback_buffer.extend(chunk)
-                audio_queue.task_done()
-            except queue.Empty:
-                if piper_process.poll() is not None and audio_queue.empty() and not any(item is not None for item in list(audio_queue.queue)):
-                    if len(internal_callback_buffer) > 0: 
-                        available_frames = len(internal_callback_buffer) // (bytes_per_sample * channels)
-                        actual_frames_to_copy = min(frames, available_frames)
-                        data_to_play = np.frombuffer(internal_callback_buffer[:actual_frames_to_copy * bytes_per_sample * channels], dtype=dtype).reshape(-1, channels)
-                        outdata[:actual_frames_to_copy] = data_to_play
-                        if actual_frames_to_copy < frames:
-                            outdata[actual_frames_to_copy:] = 0
-                        internal_callback_buffer = internal_callback_buffer[actual_frames_to_copy * bytes_per_sample * channels:]
-                    else:
-                        outdata[:] = 0
-                    raise sd.CallbackStop("Piper process ended and queue depleted.")
-                outdata[:] = 0 
-                return
-
-        if len(internal_callback_buffer) >= requested_bytes:
-            data_chunk_bytes = internal_callback_buffer[:requested_bytes]
-            internal_callback_buffer = internal_callback_buffer[requested_bytes:]
-            
-            data_np = np.frombuffer(data_chunk_bytes, dtype=dtype).reshape(frames, channels)
-            outdata[:] = data_np
-        else:
-            outdata[:] = 0
 
+def speak_chunks(text_chunks, model_filename, turn=None):
+    """
+    Queues a sequence of text chunks on the playback engine and waits until it
+    has been played. Chunks are handed to the Piper worker as they arrive, so
+    playback of the first sentence starts while later ones (or later LLM
+    tokens) are still being produced. The reply is registered as current_turn
+    so barge_in() can stop it.
+    """
+    global current_turn
+    turn = turn or AgentTurn()
+    turn.model_filename = model_filename
+    current_turn = turn
+    engine = playback.get_engine()
+    utterance = None
 
     try:
-        print(f"Preparing to run Piper: {' '.join(piper_command_list)}")
-        piper_process = subprocess.Popen(
-            piper_command_list,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            bufsize=0 
-        )
-
-        reader_thread = threading.Thread(target=piper_reader_thread_func, args=(piper_process.stdout, audio_queue, stop_event))
-        reader_thread.daemon = True 
-        reader_thread.start()
-
-        if piper_process.stdin:
-            piper_process.stdin.write(text.encode('utf-8'))
-            piper_process.stdin.close()
-
-        time.sleep(0.15) # Time for the Piper to start (adjust) and fill initial queue buffer
-
-        stream = sd.OutputStream(
-            samplerate=sample_rate,
-            channels=channels,
-            dtype=dtype,
-            callback=sounddevice_callback,
-            finished_callback=playback_finished_event.set
-        )
-        
-        print(f"Starting audio stream...")
-        with stream:
-            playback_finished_event.wait()
+        utterance = engine.speak(text_chunks, model_filename, tts_cache.get_cache())
+        turn.utterance = utterance
+        if turn.interrupted.is_set():
+            utterance.cancel()
+        if not utterance.wait_started():
+            if not turn.interrupted.is_set():
+                print("Piper produced no audio.")
+            return utterance
+        ttfa = utterance.time_to_first_audio()
+        print(f"Time to first audio: {ttfa * 1000:.1f} ms")
+        barge_in_detector.reset()
+        utterance.wait()
+        print("Utterance finished.", engine.stats(), "TTS cache:", tts_cache.get_cache().stats())
 
-        print("Audio stream finished.")
-        
-        piper_stderr_bytes = piper_process.stderr.read()
-        piper_return_code = piper_process.wait() 
-
-        if piper_return_code != 0:
-            print(f"Piper process error (Return Code: {piper_return_code}).")
-            if piper_stderr_bytes:
-                print("--- Piper Stderr ---")
-                print(piper_stderr_bytes.decode('utf-8', errors='ignore').strip())
-                print("--------------------")
-
-    except sd.CallbackStop:
-        print("Playback stopped by callback.")
-    except FileNotFoundError:
-         print(f"Error: Cannot find piper. Check path.")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        stop_event.set() 
-
-        if reader_thread and reader_thread.is_alive():
-            reader_thread.join(timeout=1)
-
-        if piper_process:
-            if piper_process.stdin and not piper_process.stdin.closed:
-                try: piper_process.stdin.close()
-                except BrokenPipeError: pass
-            if piper_process.stdout and not piper_process.stdout.closed:
-                piper_process.stdout.close()
-            if piper_process.stderr and not piper_process.stderr.closed:
-                remaining_stderr = piper_process.stderr.read() 
-                if remaining_stderr:
-                     print("--- Piper Stderr (at finally) ---")
-                     print(remaining_stderr.decode('utf-8', errors='ignore').strip())
-                     print("-------------------------")
-                piper_process.stderr.close()
-
-            if piper_process.poll() is None: 
-                piper_process.terminate()
-                try:
-                    piper_process.wait(timeout=0.5)
-                except subprocess.TimeoutExpired:
-                    piper_process.kill()
-                    piper_process.wait(timeout=0.5)
-        while not audio_queue.empty():
-            try:
-                audio_queue.get_nowait()
-                audio_queue.task_done()
-            except queue.Empty:
-                break
-
-
-
-
-def recognition(audiofile1):
+        vad_detector.reset()
+        if current_turn is turn:
+            current_turn = None
+    return utterance
+
+
+
+
+def recognition(audio_data):
     try: 
-        with speech_recognition.AudioFile(audiofile1) as source:
-            audio_data = sr.record(source)
-        said_text = sr.recognize_google(audio_data, language=lang_code)
+        request_start = time.perf_counter()
+        said_text = stt_client.recognize(audio_data, lang_code)
+        upload_seconds = time.perf_counter() - request_start
+        if audio_data.flac_bytes is not None:
+            print(f"STT upload: {audio_data.flac_bytes} bytes FLAC @ {audio_data.sample_rate} Hz, "
+                  f"encode {audio_data.encode_seconds * 1000:.0f} ms, request {upload_seconds * 1000:.0f} ms")
+        stt_client.stats.report()
+        if said_text is None:
+            print("Sorry, could not understand the audio.")
+            return None
         print("You said:", said_text)
         return said_text
     except speech_recognition.UnknownValueError:
@@ -395,14 +371,174 @@ def recognition(audiofile1):
 
 
 def out(speechtext):
-    sil= ",,,,,,"+speechtext
-    lang_map = {
-        'en-IN': "en_GB-northern_english_male-medium.onnx",
-        'hi-IN': "hi_IN-pratham-medium.onnx",
-        'ml-IN': "ml_IN-arjun-medium.onnx",
-        'te-IN': "te_IN-maya-medium.onnx"
-    }
-    synthesize_speech_ffplay(sil, lang_map[lang_code])
+    synthesize_speech_ffplay(speechtext, piper_pool.lang_map[lang_code])
+
+
+def out_stream(tokens, turn=None):
+    return speak_chunks(split_speakable(tokens), piper_pool.lang_map[lang_code], turn)
+
+
+def prerender_phrases():
+    """
+    Renders each voice's greeting and fixed replies into the TTS cache in the
+    background. The texts must match what out()/out_stream() will submit, so
+    they go through the same sentence splitting.
+    """
+    from custom import initial_greeting, no_record_messages, ask_aadhaar_messages, llm_unavailable_messages
+    start = time.perf_counter()
+    rendered = 0
+    for code, language in AGENT_LANGUAGES.items():
+        texts = [initial_greeting(language)]
+        for messages in (no_record_messages, ask_aadhaar_messages, llm_unavailable_messages):
+            texts += list(split_speakable([messages[language]]))
+        rendered += tts_cache.prerender(tts_cache.get_cache(), piper_pool.get_pool(), piper_pool.lang_map[code], texts)
+    print(f"Pre-rendered {rendered} phrases in {time.perf_counter() - start:.1f}s, TTS cache: {tts_cache.get_cache().stats()}")
+
+
+def warm_up(retry=False):
+    """
+    Runs on a background thread while the language picker is up: the heavy
+    imports, the LLM client, the record database, the retrieval index, the
+    TTS voices, the output stream and the microphone. backend_ready is set
+    when it is done; backend_error says what failed, if anything. A retry
+    only redoes the parts that failed.
+    """
+    global initial_greeting, achat_gen, stream_sync, backend_error
+    profile = startup.profile
+    failed = []
+    try:
+        if initial_greeting is None:
+            with profile.step("custom (LangChain, LLM client)", "import"):
+                from custom import initial_greeting, achat_gen, stream_sync
+        with profile.step("records database"):
+            import records
+            records.get_store()
+        with profile.step("lexical index"):
+            import lexical
+            lexical.get_index()
+    except Exception as e:
+        print(f"Warm-up of the agent backend failed: {e!r}")
+        failed.append("agent backend")
+    try:
+        if stream is None:
+            warm_up_audio(profile)
+    except Exception as e:
+        print(f"Warm-up of the audio devices failed: {e!r}")
+        failed.append("audio devices")
+    finally:
+        backend_error = ", ".join(failed) or None
+        backend_ready.set()
+    if retry:
+        return
+    threading.Thread(target=prerender_phrases, daemon=True).start()
+    picker_shown.wait(10)
+    profile.report()
+
+
+def warm_up_audio(profile):
+    global sd, speech_recognition, stt_client, recorded_frames, to_audio_data
+    with profile.step("piper_pool.start_pool"):
+            piper_pool.start_pool()
+    sd = profile.import_module("sounddevice")
+    with profile.step("playback engine"):
+        playback.get_engine().start()
+    speech_recognition = profile.import_module("speech_recognition")
+    with profile.step("audio_capture, stt_backends", "import"):
+        from audio_capture import CaptureBuffer, to_audio_data
+        from stt_backends import make_stt_client
+    with profile.step("stt client"):
+        # PRAGATI_STT=local (with PRAGATI_STT_TRANSCRIPTS=<json>) runs the voice loop offline.
+        stt_client = make_stt_client(
+            os.environ.get("PRAGATI_STT", "google"),
+            transcripts_path=os.environ.get("PRAGATI_STT_TRANSCRIPTS"),
+            timeout=8.0,
+            hedge_after=4.0
+        )
+    recorded_frames = CaptureBuffer(STT_SAMPLE_RATE)
+    with profile.step("microphone stream"):
+        start_capture()
+
+
+def start_capture():
+    global stream, writer_thread
+    blocksize = int(SAMPLE_RATE * BLOCK_DURATION_MS / 1000)
+    stream = sd.InputStream(
+        samplerate=SAMPLE_RATE,
+        device=DEVICE,
+        channels=CHANNELS,
+        callback=audio_callback,
+        blocksize=blocksize,
+        dtype='float32' 
+    )
+    stream.start()
+    print(f"Audio stream started with blocksize {blocksize}...")
+
+    stop_writer.clear()
+    writer_thread = threading.Thread(target=process_audio_queue, daemon=True)
+    writer_thread.start()
+    print("Audio processing thread started.")
+
+
+def retry_warm_up():
+    backend_ready.clear()
+    threading.Thread(target=warm_up, args=(True,), name="warm-up", daemon=True).start()
+    show_getting_ready()
+
+
+def show_getting_ready():
+    """
+    Stands in for the chat screen until warm_up() is done, polling from the Tk
+    loop so the window stays responsive. A failed warm-up shows what is
+    missing and offers a retry instead of opening a chat screen that can't work.
+    """
+    for widget in rootmain.winfo_children():
+        widget.destroy()
+    status_frame = customtkinter.CTkFrame(rootmain, fg_color='transparent')
+    status_frame.place(relx=0.5, rely=0.5, anchor='center')
+    status_label = customtkinter.CTkLabel(
+        status_frame,
+        text="Getting ready...",
+        font=("Arial Rounded MT Bold", 28),
+        text_color='white'
+    )
+    status_label.pack(pady=20)
+
+    def poll():
+        if not status_frame.winfo_exists():
+            return  # the user went back to the language picker
+        if not backend_ready.is_set():
+            rootmain.after(READY_POLL_MS, poll)
+        elif backend_error is None:
+            show_chat_interface()
+        else:
+            status_label.configure(text=f"Could not start the {backend_error}.")
+            customtkinter.CTkButton(
+                status_frame, text="Retry",
+                font=("Arial Rounded MT Bold", 24),
+                fg_color='#1a73e8',
+                hover_color='#155cba',
+                command=retry_warm_up,
+                corner_radius=25,
+                width=200,
+                height=70
+            ).pack(side='left', padx=20, pady=20)
+            customtkinter.CTkButton(
+                status_frame, text="Back",
+                font=("Arial Rounded MT Bold", 24),
+                fg_color="#AC3A38",
+                hover_color="#942B29",
+                command=show_language_selection,
+                corner_radius=25,
+                width=200,
+                height=70
+            ).pack(side='right', padx=20, pady=20)
+
+    poll()
+
+
+def on_picker_shown():
+    startup.profile.mark("language picker shown")
+    picker_shown.set()
 
 
 
@@ -428,6 +564,7 @@ def makeroot():
     rootmain.bind("<ButtonPress-1>", on_widget_press)
     rootmain.bind("<B1-Motion>", on_widget_drag)
     show_language_selection()
+    rootmain.after(0, on_picker_shown)
     rootmain.mainloop()
 
 
@@ -449,7 +586,8 @@ def on_widget_drag(event):
 
 
 def show_language_selection():
-    global lang_name, lang_code, rootmain, button_frame, btn
+    global lang_name, lang_code, rootmain, button_frame, btn, chat_screen_active
+    chat_screen_active = False
     for widget in rootmain.winfo_children():
         widget.destroy()
     languages = [("English", 'en-IN'), ("Hindi", 'hi-IN'), ("Malayalam", 'ml-IN'), ("Telugu", 'te-IN')]
@@ -459,12 +597,7 @@ def show_language_selection():
         lang_code = l_code 
         # selected_name = lang_name
         # selected_code = lang_code
-        language_for_agent = {
-            'en-IN': 'english',
-            'hi-IN': 'hindi',
-            'ml-IN': 'malayalam',
-            'te-IN': 'telugu'
-        }.get(lang_code, 'english')
+        language_for_agent = AGENT_LANGUAGES.get(lang_code, 'english')
         print("selected: ", language_for_agent)
         # lang_name = selected_name
         # lang_code = selected_code 
@@ -491,7 +624,14 @@ def show_language_selection():
 
 
 def show_chat_interface():
-    global chat_display, record_button, mic_icon, rootmain, back_button
+    global chat_display, record_button, mic_icon, rootmain, back_button, chat_screen_active, session_id
+    if not backend_ready.is_set() or backend_error is not None:
+        show_getting_ready()
+        return
+    # Each visit to the chat screen is a new conversation: the previous user's
+    # Aadhaar must not carry over to whoever picks a language next.
+    session_id = uuid.uuid4().hex
+    from PIL import Image
     for widget in rootmain.winfo_children():
         widget.destroy()
 
@@ -517,8 +657,7 @@ def show_chat_interface():
     img = Image.open(io.BytesIO(img_data))
     mic_icon = customtkinter.CTkImage(light_image=img, dark_image=img, size=(60, 60))    ### BUTTON
     greeting = initial_greeting(language_for_agent)
-    argsout = ",,,,,,,,,,,,"+greeting
-    threading.Thread(target=out, args=(argsout,), daemon=True).start()
+    threading.Thread(target=out, args=(greeting,), daemon=True).start()
     chat_history.append([None, greeting])
     # Scrollable: 
     chat_display = customtkinter.CTkScrollableFrame(rootmain, fg_color='#1e1f22', corner_radius=15) #'#1e1f22'
@@ -544,6 +683,8 @@ def show_chat_interface():
         corner_radius= 50   #60
     )
     record_button.pack(side='right', padx=(20, 20), pady=20)  #  pdx = 30, 30    pady = 20
+    vad_detector.reset()
+    chat_screen_active = True
 
 
 def display_message(message, sender):
@@ -567,10 +708,9 @@ def display_message(message, sender):
 
 
 
-def toggle_recording():
-    global is_button_active_global, rootmain, record_button
-    if not is_button_active_global:
-        start_recording_flag()
+def set_record_button(active):
+    global is_button_active_global, record_button
+    if active:
         record_button.configure(
             text="",  
             image=mic_icon,
@@ -579,7 +719,6 @@ def toggle_recording():
             hover_color="#bb1919"
             # activebackground="#155cba"
         )
-        is_button_active_global = True
     else:
         record_button.configure(
             text="",
@@ -589,7 +728,17 @@ def toggle_recording():
             hover_color='#155cba'
             # activebackground="#1a73e8"
         )
-        is_button_active_global = False
+    is_button_active_global = active
+
+
+def toggle_recording():
+    global is_button_active_global, rootmain, record_button
+    pressed_at = time.perf_counter()
+    if not is_button_active_global:
+        start_recording_flag(pressed_at)
+        set_record_button(True)
+    else:
+        set_record_button(False)
         rootmain.after(5, stop_recording_flag)
         # stop_recording_flag()
 # tk Main ==============================================================================================
@@ -607,33 +756,13 @@ if __name__ == "__main__":
     
 
 
-    # import after selecting the language
-    from custom import initial_greeting, chat_gen, get_key_fn, chat_llm, instruct_chat, instruct_llm
-
-    
-    # chat_history = [[None, initial_greeting(language_for_agent)]]
-    # argsout = ",,,,,,,,,,,,"+chat_history[0][1]
-    # threading.Thread(target=out, args=(argsout,), daemon=True).start()
-    
+    # The window comes up first; everything else loads behind the language picker.
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
     while True:
         try:
-            blocksize = int(SAMPLE_RATE * BLOCK_DURATION_MS / 1000)
-            stream = sd.InputStream(
-                samplerate=SAMPLE_RATE,
-                device=DEVICE,
-                channels=CHANNELS,
-                callback=audio_callback,
-                blocksize=blocksize,
-                dtype='float32' 
-            )
-            stream.start()
-            print(f"Audio stream started with blocksize {blocksize}...")
-
-            stop_writer.clear()
-            writer_thread = threading.Thread(target=process_audio_queue, daemon=True)
-            writer_thread.start()
-            print("Audio processing thread started.")
+            if stream is None and backend_ready.is_set() and backend_error is None:
+                start_capture()
             makeroot()
                 
         except Exception as e:
@@ -645,6 +774,7 @@ if __name__ == "__main__":
                 print("Stopping audio stream...")
                 stream.stop()
                 stream.close()
+                stream = None
                 print("Audio stream closed.")
 
             if writer_thread is not None:
@@ -656,9 +786,9 @@ if __name__ == "__main__":
                     else:
                         print("Writer thread stopped.")
 
-            if is_recording:
+            if is_recording and DEBUG_CAPTURE and recorded_frames is not None:
                     print("Saving recording that was in progress...")
                     is_recording = False
                     time.sleep(0.2)
-                    save_recording()
+                    save_recording(recorded_frames.take())
 